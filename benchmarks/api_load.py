@@ -0,0 +1,324 @@
+"""Нагрузочный прогон /api/v1/: list, retrieve, фильтры и создание для каждого ViewSet.
+
+    python -m benchmarks.api_load --output api_load.json
+    python -m benchmarks.api_load --transport wsgi --concurrency 4
+    python -m benchmarks.api_load --products 1000000 --reviews 5000000 --orders 2000000
+
+Транспорты:
+    inprocess - APIClient, запрос проходит весь стек Django (middleware, роутинг, DRF) без сети;
+    wsgi      - локальный WSGI-сервер (wsgiref, поток на запрос) и http.client;
+    asgi      - django.test.AsyncClient через ASGIHandler.
+
+Для каждого сценария в отчёт попадают p50/p95/p99, среднее и число запросов в секунду.
+Ключи отчёта отсортированы, так что JSON разных коммитов удобно сравнивать diff'ом.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks.common import latency_summary, setup_django, test_database, write_report
+
+# role - чей токен отправляется: None, 'shopper', 'reviewer' или 'admin';
+# authorization - готовый заголовок Authorization (для записанного трафика), важнее role
+Call = namedtuple('Call', ['method', 'path', 'params', 'data', 'role', 'authorization'], defaults=[None])
+
+
+def authorization(tokens, call):
+    if call.authorization:
+        return call.authorization
+    return 'Token %s' % tokens[call.role] if call.role else None
+
+
+class Context:
+    """Данные, на которые ссылаются сценарии: id объектов и токены."""
+
+    def __init__(self):
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from shop.models import Collection, Order, Product, Review
+
+        self.random = random.Random(0)
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+        self.review_ids = list(Review.objects.values_list('id', flat=True))
+        self.collection_ids = list(Collection.objects.values_list('id', flat=True))
+        self.user_ids = list(User.objects.values_list('id', flat=True))
+
+        shopper = User.objects.filter(order__isnull=False).order_by('id').first()
+        self.shopper_id = shopper.id
+        self.order_ids = list(Order.objects.filter(creator=shopper).values_list('id', flat=True))
+        # у автора новых отзывов ещё нет ни одного отзыва
+        reviewer = User.objects.create_user('bench-reviewer')
+        admin = User.objects.create_superuser('bench-admin')
+        self.tokens = {
+            role: Token.objects.create(user=person).key
+            for role, person in [('shopper', shopper), ('reviewer', reviewer), ('admin', admin)]
+        }
+        self.unreviewed = iter(self.product_ids)
+        self.lock = threading.Lock()
+
+    def pick(self, ids):
+        return self.random.choice(ids)
+
+    def next_unreviewed(self):
+        with self.lock:
+            return next(self.unreviewed)
+
+    def price_range(self):
+        low = self.random.randint(1, 4000)
+        return {'price_min': low, 'price_max': low + 100, 'page_size': 100}
+
+
+def scenarios(ctx):
+    """Имя сценария -> функция, возвращающая очередной Call."""
+    page = {'page_size': 100}
+    return {
+        'products.list': lambda: Call('get', '/api/v1/products/', page, None, None),
+        'products.retrieve': lambda: Call(
+            'get', '/api/v1/products/%d/' % ctx.pick(ctx.product_ids), None, None, None),
+        'products.filter_price': lambda: Call('get', '/api/v1/products/', ctx.price_range(), None, None),
+        # поиск сортирует по релевантности, keyset-пагинация с ним не сочетается
+        'products.search': lambda: Call(
+            'get', '/api/v1/products/', {'q': 'Товар %d' % ctx.random.randint(1, 999)}, None, None),
+        'products.create': lambda: Call(
+            'post', '/api/v1/products/', None, {'title': 'Новый товар', 'price': '99.90'}, 'admin'),
+
+        'reviews.list': lambda: Call('get', '/api/v1/product-reviews/', page, None, None),
+        'reviews.retrieve': lambda: Call(
+            'get', '/api/v1/product-reviews/%d/' % ctx.pick(ctx.review_ids), None, None, None),
+        'reviews.filter_product': lambda: Call(
+            'get', '/api/v1/product-reviews/', {'product': ctx.pick(ctx.product_ids), **page}, None, None),
+        'reviews.create': lambda: Call(
+            'post', '/api/v1/product-reviews/', None,
+            {'product': ctx.next_unreviewed(), 'grade': 5, 'description': 'Хорошо'}, 'reviewer'),
+
+        'orders.list': lambda: Call('get', '/api/v1/orders/', page, None, 'shopper'),
+        'orders.retrieve': lambda: Call(
+            'get', '/api/v1/orders/%d/' % ctx.pick(ctx.order_ids), None, None, 'shopper'),
+        'orders.filter_status': lambda: Call('get', '/api/v1/orders/', {'status': 'DONE', **page}, None, 'shopper'),
+        'orders.create': lambda: Call(
+            'post', '/api/v1/orders/', None,
+            {'creator': ctx.shopper_id, 'items': [{'product': ctx.pick(ctx.product_ids), 'quantity': 2}]},
+            'shopper'),
+
+        'collections.list': lambda: Call('get', '/api/v1/product-collections/', page, None, None),
+        'collections.retrieve': lambda: Call(
+            'get', '/api/v1/product-collections/%d/' % ctx.pick(ctx.collection_ids), None, None, None),
+        'collections.expand': lambda: Call(
+            'get', '/api/v1/product-collections/', {'expand': 'products', **page}, None, None),
+        'collections.create': lambda: Call(
+            'post', '/api/v1/product-collections/', None,
+            {'title': 'Подборка', 'products': [ctx.pick(ctx.product_ids)]}, 'admin'),
+
+        'analytics.totals': lambda: Call('get', '/api/v1/analytics/', None, None, 'admin'),
+        'analytics.products': lambda: Call('get', '/api/v1/analytics/products/', None, None, 'admin'),
+
+        'profiles.list': lambda: Call('get', '/api/v1/all-profiles/', page, None, None),
+        'profiles.retrieve': lambda: Call(
+            'get', '/api/v1/all-profiles/%d/' % ctx.pick(ctx.user_ids), None, None, None),
+    }
+
+
+class InProcessTransport:
+
+    def __init__(self, tokens):
+        from rest_framework.test import APIClient
+        self.tokens = tokens
+        self.local = threading.local()
+        self.client_class = APIClient
+
+    def headers(self, call):
+        header = authorization(self.tokens, call)
+        return {'HTTP_AUTHORIZATION': header} if header else {}
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.client_class()
+        return self.local.client
+
+    def send(self, call):
+        client = self.client()
+        if call.method == 'get':
+            response = client.get(call.path, call.params, **self.headers(call))
+        else:
+            response = getattr(client, call.method)(call.path, call.data, format='json', **self.headers(call))
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class ASGITransport(InProcessTransport):
+    """Запросы идут через ASGIHandler в одном фоновом цикле событий."""
+
+    def __init__(self, tokens):
+        from django.test import AsyncClient
+        super().__init__(tokens)
+        self.client_class = AsyncClient
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def headers(self, call):
+        # AsyncClient превращает extra в заголовки как есть, без префикса HTTP_
+        header = authorization(self.tokens, call)
+        return {'authorization': header} if header else {}
+
+    def send(self, call):
+        client, headers = self.client(), self.headers(call)
+
+        async def request():
+            if call.method == 'get':
+                # AsyncClient в Django 3.2 теряет data у GET, поэтому строка запроса - в пути
+                query = '?' + urlencode(call.params) if call.params else ''
+                return await client.get(call.path + query, **headers)
+            body = '' if call.data is None else json.dumps(call.data)
+            return await getattr(client, call.method)(
+                call.path, body, content_type='application/json', **headers)
+        return asyncio.run_coroutine_threadsafe(request(), self.loop).result().status_code
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class HTTPTransport:
+    """Запросы по HTTP к уже запущенному серверу, по соединению на поток."""
+
+    def __init__(self, tokens, host='127.0.0.1', port=8000):
+        self.tokens = tokens
+        self.host = host
+        self.port = port
+        self.local = threading.local()
+
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection(self.host, self.port)
+        return self.local.connection
+
+    def send(self, call):
+        headers = {'Accept': 'application/json'}
+        header = authorization(self.tokens, call)
+        if header:
+            headers['Authorization'] = header
+        path, body = call.path, None
+        if call.params:
+            path += '?' + urlencode(call.params)
+        if call.data is not None:
+            body = json.dumps(call.data)
+            headers['Content-Type'] = 'application/json'
+        connection = self.connection()
+        connection.request(call.method.upper(), path, body, headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        pass
+
+
+class WSGITransport(HTTPTransport):
+    """Локальный WSGI-сервер (wsgiref, поток на запрос) в фоновом потоке."""
+
+    def __init__(self, tokens):
+        from socketserver import ThreadingMixIn
+        from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+        from django.core.wsgi import get_wsgi_application
+
+        class Server(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, get_wsgi_application(), Server, QuietHandler)
+        super().__init__(tokens, port=self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+TRANSPORTS = {
+    'inprocess': InProcessTransport,
+    'asgi': ASGITransport,
+    'wsgi': WSGITransport,
+}
+
+
+def run_scenario(transport, make_call, requests, concurrency, warmup):
+    for _ in range(warmup):
+        transport.send(make_call())
+
+    def timed(_):
+        call = make_call()
+        started = time.perf_counter()
+        status = transport.send(call)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(timed, range(requests)))
+    else:
+        results = [timed(number) for number in range(requests)]
+    seconds = time.perf_counter() - started
+
+    summary = latency_summary([latency for latency, status in results], seconds)
+    summary['errors'] = sum(1 for latency, status in results if status >= 400)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=4000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='inprocess')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200, help='запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help='сценарии (по префиксу имени)')
+    parser.add_argument('--output', help='JSON-файл для результатов')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from benchmarks.seed import seed
+
+    # запросы из тестового клиента и сервера должны проходить ALLOWED_HOSTS
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver', '127.0.0.1']
+
+    results = {}
+    with test_database():
+        volumes = seed(args.products, args.reviews, args.orders, chunk_size=args.chunk_size)
+        ctx = Context()
+        transport = TRANSPORTS[args.transport](ctx.tokens)
+        try:
+            for name, make_call in scenarios(ctx).items():
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                results[name] = run_scenario(transport, make_call, args.requests, args.concurrency, args.warmup)
+        finally:
+            transport.close()
+
+    write_report('api_load', {
+        'seed': volumes,
+        'transport': args.transport,
+        'concurrency': args.concurrency,
+        'scenarios': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
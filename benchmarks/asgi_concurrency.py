@@ -0,0 +1,147 @@
+"""Параллельное чтение каталога: WSGI против ASGI с синхронными и асинхронными вьюхами.
+
+    python -m benchmarks.asgi_concurrency --concurrency 1 8 32 --requests 400
+
+Режимы (все в одном процессе, без сети):
+    wsgi       - django_diplom.wsgi из пула потоков размером concurrency (как воркер gthread);
+    asgi_sync  - стандартный ASGIHandler: синхронные вьюхи DRF выполняются по очереди в одном потоке;
+    asgi_async - django_diplom.asgi: чтение каталога через shop.async_views в пуле потоков.
+Для ASGI concurrency - число одновременных запросов в одном цикле событий.
+Ответы каталога по умолчанию не кэшируются, чтобы мерить путь до БД (--cached - кэшировать).
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import latency_summary, setup_django, test_database, write_report
+
+HOST = 'testserver'
+
+
+def catalogue_paths(product_ids, collection_ids):
+    """Бесконечный поток адресов: списки и карточки товаров, отзывы, подборки."""
+    products, collections = itertools.cycle(product_ids), itertools.cycle(collection_ids)
+    while True:
+        yield '/api/v1/products/', 'page_size=100'
+        yield '/api/v1/products/%d/' % next(products), ''
+        yield '/api/v1/product-reviews/', 'page_size=100'
+        yield '/api/v1/product-collections/%d/' % next(collections), ''
+
+
+def wsgi_run(application, paths, requests, concurrency):
+    def call(request):
+        path, query = request
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'HTTP_HOST': HOST,
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        started = time.perf_counter()
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b''.join(body)
+        finally:
+            getattr(body, 'close', lambda: None)()
+        return time.perf_counter() - started, int(statuses[0].split()[0])
+
+    batch = [next(paths) for _ in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, batch))
+    return results, time.perf_counter() - started
+
+
+def asgi_run(application, paths, requests, concurrency):
+    async def call(request):
+        path, query = request
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'query_string': query.encode('ascii'),
+            'headers': [(b'host', HOST.encode('ascii'))],
+            'server': (HOST, 80), 'client': ('127.0.0.1', 0),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        return time.perf_counter() - started, messages[0]['status']
+
+    async def worker(queue, results):
+        while queue:
+            results.append(await call(queue.pop()))
+
+    async def main():
+        queue = [next(paths) for _ in range(requests)]
+        results = []
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(queue, results) for _ in range(concurrency)))
+        return results, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=400, help='запросов на режим и уровень параллельности')
+    parser.add_argument('--cached', action='store_true', help='не отключать кэш ответов каталога')
+    parser.add_argument('--output', help='JSON-файл для результатов')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.handlers.asgi import ASGIHandler
+    from benchmarks.seed import seed
+    from django_diplom.asgi import ShopASGIHandler
+    from django_diplom.wsgi import application as wsgi_application
+    from shop.models import Collection, Product
+
+    if not args.cached:
+        settings.SHOP_RESPONSE_CACHE_TIMEOUT = 0
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + [HOST]
+
+    modes = {
+        'wsgi': (wsgi_run, wsgi_application),
+        'asgi_sync': (asgi_run, ASGIHandler()),
+        'asgi_async': (asgi_run, ShopASGIHandler()),
+    }
+    results = {}
+    with test_database():
+        volumes = seed(args.products, args.reviews, args.orders)
+        paths = catalogue_paths(
+            list(Product.objects.values_list('id', flat=True)),
+            list(Collection.objects.values_list('id', flat=True)),
+        )
+        for name, (run, application) in modes.items():
+            run(application, paths, 20, 4)  # прогрев
+            for concurrency in args.concurrency:
+                samples, seconds = run(application, paths, args.requests, concurrency)
+                summary = latency_summary([latency for latency, status in samples], seconds)
+                summary['errors'] = sum(1 for latency, status in samples if status >= 400)
+                results.setdefault(name, {})['c%d' % concurrency] = summary
+
+    write_report('asgi_concurrency', {
+        'seed': volumes,
+        'cached': args.cached,
+        'modes': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
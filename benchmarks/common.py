@@ -0,0 +1,89 @@
+"""Общие утилиты для бенчмарков.
+
+Бенчмарки запускаются как модули из корня проекта, например:
+
+    python -m benchmarks.order_update
+
+Каждый бенчмарк работает на отдельной тестовой БД, которая создаётся
+перед запуском и удаляется после него.
+"""
+import json
+import math
+import os
+import platform
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_diplom.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Создаёт тестовую БД на время бенчмарка."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def measure(func, repeat):
+    """Вызывает func repeat раз, возвращает (секунды, операций в секунду)."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    seconds = time.perf_counter() - started
+    return seconds, repeat / seconds if seconds else float('inf')
+
+
+def percentile(sorted_samples, fraction):
+    """Перцентиль по методу ближайшего ранга."""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def to_ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def latency_summary(samples, seconds):
+    """Сводка по задержкам (в секундах) и общему времени прогона."""
+    samples = sorted(samples)
+    return {
+        'requests': len(samples),
+        'requests_per_second': round(len(samples) / seconds, 1) if seconds else None,
+        'mean_ms': to_ms(sum(samples) / len(samples)) if samples else None,
+        'p50_ms': to_ms(percentile(samples, 0.5)),
+        'p95_ms': to_ms(percentile(samples, 0.95)),
+        'p99_ms': to_ms(percentile(samples, 0.99)),
+        'max_ms': to_ms(samples[-1]) if samples else None,
+    }
+
+
+def write_report(name, results, path=None):
+    """Печатает результаты и, если задан путь, сохраняет их в JSON."""
+    report = {
+        'benchmark': name,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if path:
+        with open(path, 'w') as file:
+            file.write(text + '\n')
+    return report
@@ -0,0 +1,75 @@
+"""Списки товаров и отзывов: ModelSerializer против RowReader (строки .values_list()).
+
+    python -m benchmarks.list_serializers --products 2000 --reviews 5000 --repeat 5
+"""
+import argparse
+
+from benchmarks.common import measure, setup_django, test_database, write_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='JSON-файл для результатов')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from model_bakery import baker
+    from rest_framework.renderers import JSONRenderer
+    from shop import ratings
+    from shop.models import Product, Review
+    from shop.readers import RowReader
+    from shop.serializers import ProductSerializer, ReviewSerializer
+
+    results = {'repeat': args.repeat}
+    with test_database():
+        baker.make(Product, _quantity=args.products, _bulk_create=True)
+        baker.make(User, _quantity=args.reviews, _bulk_create=True)
+        # SQLite не возвращает id из bulk_create
+        products, users = list(Product.objects.all()), list(User.objects.all())
+        Review.objects.bulk_create(
+            baker.prepare(Review, creator=user, product=products[index % len(products)])
+            for index, user in enumerate(users)
+        )
+        ratings.rebuild_ratings()
+
+        cases = [
+            ('products', ProductSerializer, Product.objects.all()),
+            ('reviews', ReviewSerializer, Review.objects.select_related('creator')),
+        ]
+        renderer = JSONRenderer()
+        for name, serializer_class, queryset in cases:
+            rows = queryset.count()
+
+            def serializer_path():
+                return serializer_class(queryset.all(), many=True).data
+
+            reader = RowReader.compile(serializer_class())
+
+            def reader_path():
+                return reader.read(queryset.all())
+
+            assert renderer.render(serializer_path()) == renderer.render(reader_path())
+            serializer_seconds, serializer_rate = measure(serializer_path, args.repeat)
+            reader_seconds, reader_rate = measure(reader_path, args.repeat)
+            results[name] = {
+                'rows': rows,
+                'serializer': {
+                    'seconds': round(serializer_seconds, 4),
+                    'rows_per_second': round(rows * serializer_rate, 1),
+                },
+                'row_reader': {
+                    'seconds': round(reader_seconds, 4),
+                    'rows_per_second': round(rows * reader_rate, 1),
+                },
+                'speedup': round(reader_rate / serializer_rate, 2),
+            }
+
+    write_report('list_serializers', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
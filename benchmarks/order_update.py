@@ -0,0 +1,78 @@
+"""Обновление заказа не-админом: старый путь через exec() против плана полей.
+
+    python -m benchmarks.order_update --orders 200 --repeat 2000
+"""
+import argparse
+from types import SimpleNamespace
+
+from benchmarks.common import measure, setup_django, test_database, write_report
+
+
+def legacy_update(instance, validated_data):
+    # прежняя реализация OrderSerializer.update для не-админа
+    fields = instance._meta.fields
+    exclude = ['status']
+    for field in fields:
+        field = field.name.split('.')[-1]
+        if field in exclude:
+            continue
+        exec("instance.%s = validated_data.get(field, instance.%s)" % (field, field))
+    instance.save()
+    return instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--output', help='JSON-файл для результатов')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from model_bakery import baker
+    from shop.serializers import OrderSerializer
+
+    with test_database():
+        user = baker.make(User)
+        orders = baker.make('shop.Order', creator=user, _quantity=args.orders)
+        serializer = OrderSerializer(context={'request': SimpleNamespace(user=user)})
+        validated_data = {'creator': user}
+
+        def cycle(update):
+            position = 0
+
+            def step():
+                nonlocal position
+                update(orders[position % len(orders)], dict(validated_data))
+                position += 1
+            return step
+
+        with CaptureQueriesContext(connection) as legacy_sql:
+            legacy_update(orders[0], dict(validated_data))
+        with CaptureQueriesContext(connection) as plan_sql:
+            serializer.update_instance(orders[0], dict(validated_data))
+
+        legacy_seconds, legacy_rate = measure(cycle(legacy_update), args.repeat)
+        plan_seconds, plan_rate = measure(cycle(serializer.update_instance), args.repeat)
+
+    write_report('order_update', {
+        'repeat': args.repeat,
+        'legacy_exec': {
+            'seconds': round(legacy_seconds, 4),
+            'updates_per_second': round(legacy_rate, 1),
+            'sql': legacy_sql.captured_queries[-1]['sql'],
+        },
+        'field_plan': {
+            'seconds': round(plan_seconds, 4),
+            'updates_per_second': round(plan_rate, 1),
+            'sql': plan_sql.captured_queries[-1]['sql'],
+        },
+        'speedup': round(plan_rate / legacy_rate, 2),
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
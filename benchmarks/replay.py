@@ -0,0 +1,213 @@
+"""Воспроизведение записанного трафика (JSONL) на API.
+
+    python -m benchmarks.replay benchmarks/sample_traffic.jsonl
+    python -m benchmarks.replay capture.jsonl --transport wsgi --concurrency 8 --speed 2
+    python -m benchmarks.replay capture.jsonl --url http://127.0.0.1:8000 --speed 0
+
+Строка записи - JSON-объект:
+    {"ts": 0.25, "method": "GET", "path": "/api/v1/products/?price_min=10"}
+    {"ts": 0.40, "method": "POST", "path": "/api/v1/orders/", "role": "shopper",
+     "body": {"creator": "{shopper}", "items": [{"product": "{product}", "quantity": 1}]}}
+
+ts - метка времени запроса в секундах: паузы между запросами воспроизводятся,
+ускоренные в --speed раз (--speed 0 - без пауз). role - чей токен тестовой БД отправить
+(shopper, reviewer, admin), authorization - готовый заголовок Authorization.
+{product}, {review}, {order}, {collection}, {user}, {shopper}, {unreviewed} в пути и теле
+заменяются id объектов тестовой БД. Строки без method и path пропускаются.
+
+Без --url перед прогоном создаётся тестовая БД и наполняется как в api_load
+(--products/--reviews/--orders), запросы идут через --transport. С --url запросы уходят
+на уже запущенный сервер с его БД: role и подстановки id там не используются.
+Файл читается построчно, в работе одновременно не больше 2 * --concurrency запросов.
+
+В отчёте по каждому эндпоинту (метод и имя маршрута) - p50/p95/p99, ошибки и их доля;
+lag_max_ms - насколько отправка отставала от расписания записи.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from benchmarks.api_load import TRANSPORTS, Call, Context, HTTPTransport
+from benchmarks.common import latency_summary, setup_django, test_database, to_ms, write_report
+
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+class IdPicker:
+    """Значения подстановок {name} из тестовой БД."""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.ids = {
+            'product': ctx.product_ids,
+            'review': ctx.review_ids,
+            'order': ctx.order_ids,
+            'collection': ctx.collection_ids,
+            'user': ctx.user_ids,
+        }
+
+    def __call__(self, name):
+        if name == 'shopper':
+            return self.ctx.shopper_id
+        if name == 'unreviewed':
+            return self.ctx.next_unreviewed()
+        return self.ctx.pick(self.ids[name])
+
+
+def fill(value, pick):
+    """Заменяет {name} в строках (в том числе вложенных в тело запроса) на id."""
+    if pick is None:
+        return value
+    if isinstance(value, str):
+        whole = PLACEHOLDER.fullmatch(value)
+        if whole:
+            return pick(whole.group(1))
+        return PLACEHOLDER.sub(lambda match: str(pick(match.group(1))), value)
+    if isinstance(value, list):
+        return [fill(item, pick) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, pick) for key, item in value.items()}
+    return value
+
+
+@lru_cache(maxsize=4096)
+def endpoint_name(method, path):
+    """'GET products-detail' - имя маршрута вместо пути с id."""
+    from django.urls import Resolver404, resolve
+    try:
+        name = resolve(urlsplit(path).path).url_name
+    except Resolver404:
+        name = None
+    return '%s %s' % (method.upper(), name or urlsplit(path).path)
+
+
+def read_capture(lines, tokens, pick, skipped):
+    """Поток (ts, эндпоинт, Call) из строк записи; негодные строки считаются в skipped."""
+    for line in lines:
+        try:
+            record = json.loads(line) if line.strip() else None
+            method = str(record['method']).lower()
+            if method not in METHODS or not str(record['path']).startswith('/'):
+                raise ValueError(method)
+            path = fill(record['path'], pick)
+            data = fill(record.get('body'), pick)
+            ts = float(record.get('ts') or 0)
+        except (TypeError, ValueError, KeyError):
+            skipped[0] += 1
+            continue
+        role = record.get('role') if record.get('role') in tokens else None
+        yield ts, endpoint_name(method, path), Call(method, path, None, data, role, record.get('authorization'))
+
+
+class Replay:
+    """Отправляет запросы по расписанию записи из пула потоков."""
+
+    def __init__(self, transport, concurrency=1, speed=1.0):
+        self.transport = transport
+        self.concurrency = concurrency
+        self.speed = speed
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.lag = 0.0
+
+    def send(self, endpoint, call, slots):
+        started = time.perf_counter()
+        try:
+            status = self.transport.send(call)
+        except Exception:
+            # оборванное соединение и т.п. считается ошибкой, прогон продолжается
+            status = 599
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((latency, status))
+        slots.release()
+
+    def run(self, entries):
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+        first_ts = None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            for ts, endpoint, call in entries:
+                if self.speed > 0:
+                    first_ts = ts if first_ts is None else first_ts
+                    delay = started + (ts - first_ts) / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        self.lag = max(self.lag, -delay)
+                slots.acquire()
+                pool.submit(self.send, endpoint, call, slots)
+        return time.perf_counter() - started
+
+    def summary(self, seconds):
+        def describe(samples):
+            result = latency_summary([latency for latency, status in samples], seconds)
+            result['errors'] = sum(1 for latency, status in samples if status >= 400)
+            result['error_rate'] = round(result['errors'] / len(samples), 4) if samples else None
+            return result
+
+        everything = [sample for samples in self.samples.values() for sample in samples]
+        return {
+            'endpoints': {endpoint: describe(samples) for endpoint, samples in self.samples.items()},
+            'total': describe(everything),
+            'lag_max_ms': to_ms(self.lag),
+        }
+
+
+def replay_file(path, transport, tokens, pick, concurrency, speed):
+    skipped = [0]
+    replay = Replay(transport, concurrency, speed)
+    with open(path, encoding='utf-8') as lines:
+        seconds = replay.run(read_capture(lines, tokens, pick, skipped))
+    result = replay.summary(seconds)
+    result['skipped'] = skipped[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='JSONL-файл с записанными запросами')
+    parser.add_argument('--url', help='адрес запущенного сервера, например http://127.0.0.1:8000')
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='inprocess')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--speed', type=float, default=1.0, help='ускорение относительно записи, 0 - без пауз')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=4000)
+    parser.add_argument('--output', help='JSON-файл для результатов')
+    args = parser.parse_args()
+
+    setup_django()
+    report = {'capture': args.capture, 'concurrency': args.concurrency, 'speed': args.speed}
+    if args.url:
+        url = urlsplit(args.url)
+        transport = HTTPTransport({}, url.hostname, url.port or 80)
+        report['url'] = args.url
+        result = replay_file(args.capture, transport, {}, None, args.concurrency, args.speed)
+    else:
+        from django.conf import settings
+        from benchmarks.seed import seed
+
+        # запросы из тестового клиента и сервера должны проходить ALLOWED_HOSTS
+        settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver', '127.0.0.1']
+        with test_database():
+            report['seed'] = seed(args.products, args.reviews, args.orders)
+            report['transport'] = args.transport
+            ctx = Context()
+            transport = TRANSPORTS[args.transport](ctx.tokens)
+            try:
+                result = replay_file(args.capture, transport, ctx.tokens, IdPicker(ctx), args.concurrency, args.speed)
+            finally:
+                transport.close()
+
+    write_report('replay', dict(report, **result), args.output)
+
+
+if __name__ == '__main__':
+    main()
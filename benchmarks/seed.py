@@ -0,0 +1,115 @@
+"""Наполнение БД данными для бенчмарков через рецепты model_bakery.
+
+Объекты готовятся рецептами пачками и сохраняются через bulk_create,
+агрегаты (рейтинги, суммы заказов, аналитика) пересчитываются в конце одним проходом.
+"""
+import random
+import sys
+from decimal import Decimal
+
+from model_bakery.recipe import Recipe, seq
+
+SEED = 2021
+
+user = Recipe('auth.User', username=seq('shopper'))
+product = Recipe(
+    'shop.Product',
+    title=seq('Товар '),
+    price=lambda: Decimal(random.randint(100, 500000)) / 100,
+)
+review = Recipe(
+    'shop.Review',
+    grade=lambda: random.choice([1, 2, 3, 4, 4, 5, 5, 5]),
+)
+order = Recipe(
+    'shop.Order',
+    status=lambda: random.choice(['NEW', 'IN_PROGRESS', 'DONE', 'DONE', 'DONE']),
+)
+line = Recipe('shop.ProductsInOrder', quantity=lambda: random.randint(1, 5))
+collection = Recipe('shop.Collection', title=seq('Подборка '))
+
+
+def progress(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def make_rows(recipe, total, chunk_size, fill=None, **attrs):
+    """Создаёт total объектов рецепта пачками; fill(obj, номер) проставляет связи."""
+    created = 0
+    while created < total:
+        size = min(chunk_size, total - created)
+        objs = recipe.prepare(_quantity=size, **attrs)
+        if fill is not None:
+            for offset, obj in enumerate(objs):
+                fill(obj, created + offset)
+        type(objs[0]).objects.bulk_create(objs, batch_size=chunk_size)
+        created += size
+        progress('%s: %d / %d' % (type(objs[0]).__name__, created, total))
+
+
+def ids(model):
+    # SQLite не возвращает id из bulk_create
+    return list(model.objects.order_by('id').values_list('id', flat=True))
+
+
+def seed(products=1000, reviews=5000, orders=2000, users=None, collections=None,
+         lines_per_order=3, collection_size=20, chunk_size=5000):
+    """Наполняет БД и возвращает фактические объёмы."""
+    from django.contrib.auth.models import User
+    from shop import analytics, pricing, ratings
+    from shop.models import Collection, Order, Product
+
+    random.seed(SEED)
+    # пар (пользователь, товар) должно хватить на все отзывы
+    users = users or max(1, min(orders // 4, 100000), -(-reviews // products))
+    if collections is None:
+        collections = max(1, products // 1000)
+
+    make_rows(user, users, chunk_size)
+    user_ids = ids(User)
+    make_rows(product, products, chunk_size)
+    product_ids = ids(Product)
+
+    def fill_review(obj, number):
+        # у одного пользователя все товары разные: сдвиг зависит только от пользователя
+        person, turn = number % len(user_ids), number // len(user_ids)
+        obj.creator_id = user_ids[person]
+        obj.product_id = product_ids[(turn + person * 31) % len(product_ids)]
+
+    make_rows(review, reviews, chunk_size, fill=fill_review, creator_id=0, product_id=0)
+
+    def fill_order(obj, number):
+        obj.creator_id = user_ids[number % len(user_ids)]
+
+    make_rows(order, orders, chunk_size, fill=fill_order, creator_id=0)
+    order_ids = ids(Order)
+
+    def fill_line(obj, number):
+        obj.order_id = order_ids[number // lines_per_order]
+        obj.product_id = random.choice(product_ids)
+
+    make_rows(line, len(order_ids) * lines_per_order, chunk_size, fill=fill_line, order_id=0, product_id=0)
+
+    make_rows(collection, collections, chunk_size)
+    through = Collection.products.through
+    through.objects.bulk_create(
+        [
+            through(collection_id=collection_id, product_id=product_id)
+            for collection_id in ids(Collection)
+            for product_id in random.sample(product_ids, min(collection_size, len(product_ids)))
+        ],
+        batch_size=chunk_size,
+    )
+
+    progress('пересчёт агрегатов')
+    ratings.rebuild_ratings()
+    pricing.reprice_orders(Order.objects.all())
+    analytics.refresh_days()
+    return {
+        'users': len(user_ids),
+        'products': len(product_ids),
+        'reviews': reviews,
+        'orders': len(order_ids),
+        'order_lines': len(order_ids) * lines_per_order,
+        'collections': collections,
+    }
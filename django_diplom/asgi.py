@@ -9,8 +9,24 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_diplom.settings')
 
-application = get_asgi_application()
+
+class ShopASGIHandler(ASGIHandler):
+    """ASGIHandler, который маршрутизирует запросы по django_diplom.asgi_urls."""
+
+    urlconf = 'django_diplom.asgi_urls'
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+# то же, что get_asgi_application(), но со своим обработчиком
+django.setup(set_prefix=False)
+application = ShopASGIHandler()
@@ -0,0 +1,10 @@
+"""URL-конфигурация для ASGI: чтение каталога через асинхронные вьюхи (shop.async_views),
+остальные маршруты - как в django_diplom.urls."""
+from django.urls import include, path
+
+from django_diplom.urls import urlpatterns as wsgi_urlpatterns
+from shop.async_views import catalogue_urls
+
+urlpatterns = [
+    path('api/v1/', include(catalogue_urls())),
+] + wsgi_urlpatterns
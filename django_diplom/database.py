@@ -0,0 +1,58 @@
+"""Настройки БД из переменных окружения.
+
+DB_ENGINE                 - бэкенд Django (по умолчанию SQLite)
+DB_NAME, DB_HOST, DB_PORT - параметры подключения
+DB_CONN_MAX_AGE           - сколько секунд держать соединение между запросами
+                            (0 - закрывать после каждого запроса, none - без ограничения)
+DB_HEALTH_CHECK_INTERVAL  - через сколько секунд простоя проверять соединение
+                            перед использованием (none - не проверять)
+DB_POOL                   - 1 / true / on: пул соединений в процессе (только PostgreSQL)
+DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT - размер пула и ожидание соединения
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+POSTGRESQL_ENGINES = ('django.db.backends.postgresql', 'django.db.backends.postgresql_psycopg2')
+POOL_ENGINE = 'shop.backends.postgresql_pool'
+
+
+def env_number(environ, name, default, kind=int):
+    value = environ.get(name)
+    if value is None or value == '':
+        return default
+    if value.lower() == 'none':
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        raise ImproperlyConfigured('%s должно быть числом или none, получено %r' % (name, value))
+
+
+def env_flag(environ, name):
+    return environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(environ, user='', password=''):
+    engine = environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+    database = {
+        'ENGINE': engine,
+        'NAME': environ.get('DB_NAME', 'internet_shop'),
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        # без этого каждый запрос открывает новое соединение
+        'CONN_MAX_AGE': env_number(environ, 'DB_CONN_MAX_AGE', 60),
+        'HEALTH_CHECK_INTERVAL': env_number(environ, 'DB_HEALTH_CHECK_INTERVAL', 30, float),
+    }
+    if env_flag(environ, 'DB_POOL'):
+        if engine not in POSTGRESQL_ENGINES:
+            raise ImproperlyConfigured('DB_POOL поддерживается только для PostgreSQL, DB_ENGINE = %s' % engine)
+        database['ENGINE'] = POOL_ENGINE
+        # после запроса соединение возвращается в пул, а не держится воркером
+        database['CONN_MAX_AGE'] = 0
+        database['POOL'] = {
+            'MIN_SIZE': env_number(environ, 'DB_POOL_MIN_SIZE', 1),
+            'MAX_SIZE': env_number(environ, 'DB_POOL_MAX_SIZE', 10),
+            'TIMEOUT': env_number(environ, 'DB_POOL_TIMEOUT', 10, float),
+        }
+    return database
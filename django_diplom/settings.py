@@ -10,7 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+
+from django_diplom.database import database_settings
 from module_dotenv import secret_key, user, password
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +57,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы в замеры попадало время остальных middleware
+    'shop.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,17 +92,31 @@ WSGI_APPLICATION = 'django_diplom.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Параметры БД и пула соединений задаются переменными окружения, см. django_diplom/database.py
 DATABASES = {
+    'default': database_settings(os.environ, user, password),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Для нескольких воркеров нужен общий кэш (memcached / redis),
+# иначе сброс кэша каталога виден только в своём процессе.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': 'internet_shop',
-        'USER': user,
-        'PASSWORD': password,
-        'HOST': '127.0.0.1',
-        'PORT': '5432',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Время жизни закэшированных ответов каталога, секунд
+SHOP_RESPONSE_CACHE_TIMEOUT = 300
+
+# Кэш карточек товаров в подборках (?expand=products), секунд
+SHOP_COLLECTION_CACHE_TIMEOUT = 3600
+# Сколько товаров подборки отдаётся за раз по умолчанию
+SHOP_COLLECTION_PRODUCTS_LIMIT = 50
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -145,7 +164,38 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend'
         ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'shop.authentication.StatelessJWTAuthentication',
+        'shop.authentication.CachedTokenAuthentication',
         ],
+    # пагинация включается параметрами ?cursor= / ?page_size=
+    'DEFAULT_PAGINATION_CLASS': 'shop.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 
     }
+
+# Максимальный размер страницы, который может запросить клиент
+SHOP_MAX_PAGE_SIZE = 1000
+
+# Размер пачки для массовой загрузки товаров
+SHOP_BULK_CHUNK_SIZE = 1000
+
+# Сколько заказов читается с курсора за раз при выгрузке
+SHOP_EXPORT_CHUNK_SIZE = 2000
+
+# Списки товаров и отзывов строятся из .values_list() без ModelSerializer
+SHOP_FAST_LIST_SERIALIZERS = True
+
+# Замеры запросов: заголовок Server-Timing и статистика в /api/v1/metrics/
+SHOP_REQUEST_METRICS = True
+
+# Кэш проверенных DRF-токенов в памяти процесса: число записей и время жизни записи, с
+SHOP_TOKEN_CACHE_SIZE = 10000
+SHOP_TOKEN_CACHE_TTL = 300
+
+# Списки админки: до скольки строк (по статистике БД) таблица считается точным COUNT(*)
+SHOP_ADMIN_EXACT_COUNT_LIMIT = 100000
+
+# Снимок каталога товаров в памяти процесса (shop.catalogue): карточки и списки с фильтром по цене
+# без запросов к БД. Изменения догружаются при смене поколения каталога и не реже чем раз в MAX_AGE секунд
+SHOP_CATALOGUE_SNAPSHOT = False
+SHOP_CATALOGUE_SNAPSHOT_MAX_AGE = 5
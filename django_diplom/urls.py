@@ -15,11 +15,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from shop.views import ShopTokenObtainPairView, ShopTokenRefreshView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     path('auth/', include('djoser.urls')),
+    # JWT с claims пользователя для shop.authentication.StatelessJWTAuthentication
+    path('auth/jwt/create/', ShopTokenObtainPairView.as_view(), name='jwt-create'),
+    path('auth/jwt/refresh/', ShopTokenRefreshView.as_view(), name='jwt-refresh'),
     path('auth/', include('djoser.urls.jwt')),
 
     path('api/v1/', include('shop.urls'))
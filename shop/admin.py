@@ -1,5 +1,68 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import Product, Review, Order, Collection, ProductsInOrder
+from .pricing import update_order_total
+from .analytics import refresh_days
+
+
+def estimated_count(queryset):
+    """Число строк таблицы по статистике БД или None, если статистики нет."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(table)])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 появляется после ANALYZE, первое число stat - число строк
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # reltuples = -1 у таблицы, которую ещё не анализировали
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator списков админки без COUNT(*) по большим таблицам."""
+    """ Для списка без фильтров число строк берётся из статистики БД, если оно больше
+    SHOP_ADMIN_EXACT_COUNT_LIMIT. Отфильтрованные и небольшие списки считаются точно,
+    но без аннотаций changelist'а, чтобы COUNT(*) не выполнял подзапросы для каждой строки."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > getattr(settings, 'SHOP_ADMIN_EXACT_COUNT_LIMIT', 100000):
+                return estimate
+        return queryset.order_by().values('pk').count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Списки больших таблиц: оценка числа строк вместо COUNT(*)."""
+
+    paginator = EstimatedCountPaginator
+    # без второго COUNT(*) по всей таблице при поиске и фильтрах
+    show_full_result_count = False
+
+
+def positions_count():
+    """Число позиций заказа подзапросом: считается только для строк текущей страницы."""
+    positions = ProductsInOrder.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    return Coalesce(Subquery(positions.annotate(count=Count('pk')).values('count'), output_field=IntegerField()), 0)
 
 
 class ProductsInOrderInline(admin.TabularInline):
@@ -13,24 +76,51 @@ class ProductInline(admin.TabularInline):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ('title', 'price',)
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdmin):
     list_display = ('product', 'grade', 'creator',)
+    list_select_related = ('product', 'creator',)
 
 
 @admin.register(Order)
 @admin.display(ordering='created_at')
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ('status', 'creator', 'created_at', 'quantity',)
+    list_select_related = ('creator',)
     inlines = [ProductsInOrderInline]
+    readonly_fields = ('total_amount',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(positions_count=positions_count())
+
+    @admin.display(description='Количество товаров', ordering='positions_count')
+    def quantity(self, obj):
+        # Order.quantity() делал бы COUNT для каждой строки списка
+        return obj.positions_count
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # позиции могли измениться в инлайне
+        update_order_total(form.instance)
+        refresh_days([timezone.localdate(form.instance.created_at)])
+
+    def delete_model(self, request, obj):
+        day = timezone.localdate(obj.created_at)
+        super().delete_model(request, obj)
+        refresh_days([day])
+
+    def delete_queryset(self, request, queryset):
+        days = [timezone.localdate(created_at) for created_at in queryset.values_list('created_at', flat=True)]
+        super().delete_queryset(request, queryset)
+        refresh_days(days)
 
 
 @admin.register(Collection)
-class CollectionAdmin(admin.ModelAdmin):
+class CollectionAdmin(LargeTableAdmin):
     list_display = ('title', 'description',)
     inlines = [ProductInline]
     exclude = ('products',)
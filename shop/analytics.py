@@ -0,0 +1,205 @@
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, ProductsInOrder, SalesRollup, OrderStatusRollup
+from .pricing import line_amount
+
+# Вклад одного заказа в сводные таблицы:
+# lines - список (product_id, units, revenue)
+Contribution = namedtuple('Contribution', ['day', 'status', 'lines'])
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+def order_contribution(order):
+    """Снимок заказа для сводных таблиц: день, статус и позиции (один запрос)."""
+    """ Выручка считается по ценам позиций, а не по текущим ценам товаров:
+    вклад, вычитаемый после смены цены, равен добавленному раньше."""
+    if order.pk is None:
+        return None
+    lines = list(
+        ProductsInOrder.objects
+        .filter(order_id=order.pk)
+        .values_list('product_id', 'quantity')
+        .annotate(revenue=line_amount())
+    )
+    return Contribution(timezone.localdate(order.created_at), order.status, lines)
+
+
+def _increment(model, key, **deltas):
+    """UPDATE ... SET x = x + delta, а если строки ещё нет - INSERT."""
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # строку успел создать параллельный запрос
+        model.objects.filter(**key).update(**changes)
+
+
+def apply_contribution(contribution, sign):
+    if contribution is None:
+        return
+    _increment(OrderStatusRollup, {'day': contribution.day, 'status': contribution.status}, orders=sign)
+    if contribution.status != Order.OrderStatus.DONE:
+        return
+    # продажами считаются только закрытые заказы
+    for product_id, units, revenue in contribution.lines:
+        _increment(
+            SalesRollup,
+            {'day': contribution.day, 'product_id': product_id},
+            orders=sign,
+            units=sign * units,
+            revenue=sign * revenue,
+        )
+
+
+def order_created(order):
+    apply_contribution(order_contribution(order), 1)
+
+
+def order_deleted(sender, instance, **kwargs):
+    """pre_delete заказа: вычитает его вклад, в том числе при каскадном удалении."""
+    apply_contribution(order_contribution(instance), -1)
+
+
+@contextmanager
+def track_order(order):
+    """Обновляет сводные таблицы по изменению заказа внутри блока with."""
+    """ До блока из таблиц вычитается старый вклад заказа, после - добавляется новый.
+    Вклад удалённого внутри блока заказа уже вычел order_deleted."""
+
+    with transaction.atomic():
+        before = order_contribution(order)
+        yield
+        # после delete() у заказа pk = None
+        after = order_contribution(order)
+        if after is not None and before != after:
+            apply_contribution(before, -1)
+            apply_contribution(after, 1)
+
+
+def refresh_days(days=None):
+    """Пересчитывает сводные таблицы за указанные дни (или целиком) по исходным данным."""
+
+    orders = Order.objects.annotate(day=TruncDate('created_at'))
+    lines = (
+        ProductsInOrder.objects
+        .filter(order__status=Order.OrderStatus.DONE)
+        .annotate(day=TruncDate('order__created_at'))
+    )
+    sales = SalesRollup.objects.all()
+    statuses = OrderStatusRollup.objects.all()
+    if days is not None:
+        days = sorted(set(days))
+        orders = orders.filter(day__in=days)
+        lines = lines.filter(day__in=days)
+        sales = sales.filter(day__in=days)
+        statuses = statuses.filter(day__in=days)
+
+    with transaction.atomic():
+        sales.delete()
+        statuses.delete()
+        OrderStatusRollup.objects.bulk_create(
+            OrderStatusRollup(**row)
+            for row in (
+                orders
+                .order_by()
+                .values('day', 'status')
+                .annotate(orders=Count('id'))
+            )
+        )
+        SalesRollup.objects.bulk_create(
+            SalesRollup(**row)
+            for row in (
+                lines
+                .order_by()
+                .values('day', 'product_id')
+                .annotate(
+                    orders=Count('order_id', distinct=True),
+                    units=Sum('quantity'),
+                    revenue=Sum(line_amount(), output_field=AMOUNT),
+                )
+            )
+        )
+
+
+def _in_range(queryset, date_from=None, date_to=None):
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+    return queryset.order_by()
+
+
+def totals(**period):
+    sales = _in_range(SalesRollup.objects, **period).aggregate(
+        revenue=Sum('revenue'), units=Sum('units'),
+    )
+    done = _in_range(OrderStatusRollup.objects.filter(status=Order.OrderStatus.DONE), **period)
+    return {
+        'revenue': sales['revenue'] or 0,
+        'units': sales['units'] or 0,
+        'orders': done.aggregate(orders=Sum('orders'))['orders'] or 0,
+    }
+
+
+def by_product(**period):
+    return (
+        _in_range(SalesRollup.objects, **period)
+        .values('product', title=F('product__title'))
+        .annotate(revenue=Sum('revenue'), units=Sum('units'), orders=Sum('orders'))
+        .order_by('-revenue', 'product')
+    )
+
+
+def by_collection(**period):
+    # один заказ может содержать несколько товаров подборки,
+    # поэтому для подборок считаются только выручка и единицы
+    return (
+        _in_range(SalesRollup.objects.filter(product__collections__isnull=False), **period)
+        .values(collection=F('product__collections'), title=F('product__collections__title'))
+        .annotate(revenue=Sum('revenue'), units=Sum('units'))
+        .order_by('-revenue', 'collection')
+    )
+
+
+def by_day(**period):
+    sales = {
+        row['day']: row
+        for row in (
+            _in_range(SalesRollup.objects, **period)
+            .values('day')
+            .annotate(revenue=Sum('revenue'), units=Sum('units'))
+        )
+    }
+    done = (
+        _in_range(OrderStatusRollup.objects.filter(status=Order.OrderStatus.DONE), **period)
+        .values_list('day', 'orders')
+    )
+    orders = dict(done)
+    return [
+        {
+            'day': day,
+            'revenue': sales.get(day, {}).get('revenue', 0),
+            'units': sales.get(day, {}).get('units', 0),
+            'orders': orders.get(day, 0),
+        }
+        for day in sorted(set(sales) | set(orders))
+    ]
+
+
+def by_status(**period):
+    return (
+        _in_range(OrderStatusRollup.objects, **period)
+        .values('status')
+        .annotate(orders=Sum('orders'))
+        .order_by('status')
+    )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DjangoShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        from .signals import connect_signals
+        connect_signals()
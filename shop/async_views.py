@@ -0,0 +1,74 @@
+import time
+from contextlib import nullcontext
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+from django.urls import path
+
+from .views import CollectionViewSet, ProductViewSet, ReviewViewSet
+
+# Асинхронные list / retrieve каталога для ASGI.
+# В Django 3.2 нет асинхронного ORM, а синхронные вьюхи под ASGI выполняются
+# по очереди в одном общем потоке. Здесь чтение каталога (та же вьюха DRF
+# вместе с рендерингом) уходит в пул потоков, поэтому один ASGI-воркер
+# обслуживает параллельные запросы. Запись идёт обычным путём.
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def run_read(view, request, *args, **kwargs):
+    """Выполняет синхронную вьюху чтения в потоке пула."""
+    metrics = getattr(request, 'shop_metrics', None)
+    try:
+        with connection.execute_wrapper(metrics.timer) if metrics else nullcontext():
+            response = view(request, *args, **kwargs)
+            started = time.perf_counter()
+            response.render()
+            if metrics:
+                metrics.render_seconds = time.perf_counter() - started
+    finally:
+        # у каждого потока пула своё соединение: просроченное закрывается,
+        # а соединение из пула (DB_POOL) возвращается после запроса
+        close_old_connections()
+    return response
+
+
+def async_viewset_view(viewset, actions, **initkwargs):
+    """Асинхронная вьюха для маршрута ViewSet: чтение в пуле потоков, остальное - как у Django."""
+    view = viewset.as_view(actions, **initkwargs)
+    read = sync_to_async(partial(run_read, view), thread_sensitive=False)
+    write = sync_to_async(view, thread_sensitive=True)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    # то, что as_view() DRF кладёт в вьюху: отключённый CSRF и данные для метрик
+    async_view.csrf_exempt = True
+    async_view.cls = viewset
+    async_view.actions = actions
+    return async_view
+
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+
+def catalogue_urls():
+    """Маршруты каталога с асинхронным чтением; совпадают с маршрутами роутера в shop.urls."""
+    urlpatterns = []
+    for basename, viewset in [
+        ('products', ProductViewSet),
+        ('product-reviews', ReviewViewSet),
+        ('product-collections', CollectionViewSet),
+    ]:
+        list_view = async_viewset_view(viewset, LIST_ACTIONS, basename=basename, detail=False)
+        detail_view = async_viewset_view(viewset, DETAIL_ACTIONS, basename=basename, detail=True)
+        urlpatterns += [
+            path('%s/' % basename, list_view, name='%s-list' % basename),
+            # <int:pk>, чтобы дополнительные действия (products/bulk/) ушли в роутер
+            path('%s/<int:pk>/' % basename, detail_view, name='%s-detail' % basename),
+        ]
+    return urlpatterns
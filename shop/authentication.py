@@ -0,0 +1,138 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+# claims, которые кладутся в JWT при выдаче и обновлении (см. serializers.ShopTokenObtainPairSerializer)
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш ключ токена -> (пользователь, токен) со временем жизни записи."""
+    """ Кэш у каждого процесса свой: сигналы сбрасывают записи только в текущем процессе,
+    в остальных воркерах изменения видны не позже чем через ttl секунд."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, user, token = item
+            if expires <= time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return user, token
+
+    def set(self, key, user, token):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, user, token)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self.lock:
+            for key in [key for key, (expires, user, token) in self.items.items() if user.pk == user_id]:
+                del self.items[key]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+token_cache = TokenCache(
+    getattr(settings, 'SHOP_TOKEN_CACHE_SIZE', 10000),
+    getattr(settings, 'SHOP_TOKEN_CACHE_TTL', 300),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для уже проверенных токенов."""
+    """ Кэш используется только для чтения (GET, HEAD, OPTIONS): вьюхи изменения
+    могут сохранить request.user, а в кэше других воркеров он может быть устаревшим.
+    Для остальных методов пользователь читается из БД и обновляет запись в кэше."""
+
+    use_cache = True
+
+    def authenticate(self, request):
+        # аутентификатор создаётся заново для каждого запроса
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key) if self.use_cache else None
+        if cached is None:
+            # неизвестный ключ или неактивный пользователь - исключение DRF, в кэш не попадает
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+            cached = user, token
+        user, token = cached
+        # копия, чтобы атрибуты, которые вьюхи вешают на request.user, не жили между запросами
+        return copy.copy(user), token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT без запроса пользователя: User собирается из claims access-токена."""
+    """ В отличие от TokenUser из simplejwt это обычный User с id, поэтому работают
+    фильтры по внешним ключам и проверки владельца. Остальные поля модели отложены
+    и подгружаются из БД только при обращении к ним. Из claims пользователь собирается
+    только для чтения (GET, HEAD, OPTIONS): собранный User можно сохранить, и устаревшие
+    claims попали бы в БД. Для остальных методов и для токенов без наших claims
+    (выданных до их появления) пользователь читается из БД, как в JWTAuthentication."""
+
+    from_claims = True
+
+    def authenticate(self, request):
+        # аутентификатор создаётся заново для каждого запроса
+        self.from_claims = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.from_claims or not all(claim in validated_token for claim in USER_CLAIMS + (jwt_settings.USER_ID_CLAIM,)):
+            return super().get_user(validated_token)
+        data = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        data[jwt_settings.USER_ID_FIELD] = validated_token[jwt_settings.USER_ID_CLAIM]
+        data['is_active'] = True
+        # from_db ждёт значения в порядке полей модели
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in data]
+        return User.from_db('default', field_names, [data[name] for name in field_names])
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # вход через djoser обновляет только last_login - токены остаются в кэше
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    token_cache.discard_user(instance.pk)
+
+
+def token_changed(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
@@ -0,0 +1,58 @@
+"""PostgreSQL (psycopg2) с пулом соединений внутри процесса.
+
+ENGINE = 'shop.backends.postgresql_pool', параметры пула - в ключе POOL:
+MIN_SIZE, MAX_SIZE, TIMEOUT (ожидание свободного соединения, с)
+и HEALTH_CHECK_INTERVAL (через сколько секунд простоя проверять соединение).
+"""
+from functools import partial
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.base import Database
+
+from shop.pool import PoolTimeout, get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    # пул, из которого взято текущее соединение: в него же оно и возвращается
+    pool = None
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(
+            self.alias,
+            partial(Database.connect, **conn_params),
+            params=conn_params,
+            min_size=options.get('MIN_SIZE', 0),
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 10),
+            check_interval=self.settings_dict.get('HEALTH_CHECK_INTERVAL'),
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        try:
+            connection = pool.getconn()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+
+        # дальше - то же, что базовый get_new_connection делает после connect()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        # соединение возвращается в пул; после ошибок неработающее закрывается
+        if self.connection is not None:
+            broken = self.errors_occurred and not self.is_usable()
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection, broken=broken)
@@ -0,0 +1,98 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import collection_cache
+from .cache import bump_generation
+from .models import Product
+from .serializers import ProductSerializer
+from .utils import chunked
+
+
+class ProductBulkSaver:
+    """Массовое создание / обновление товаров."""
+    """ Строки с id обновляют существующие товары, без id - создают новые.
+    Каждая строка валидируется полем-потомком ProductSerializer, как в ListSerializer,
+    а сохраняется пачками через bulk_create / bulk_update. Вся загрузка идёт в одной
+    транзакции: ошибка чтения потока посередине откатывает уже записанные пачки."""
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.create_child = ProductSerializer()
+        self.update_child = ProductSerializer(partial=True)
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.rows = 0
+
+    def save(self, rows):
+        started = time.monotonic()
+        with transaction.atomic():
+            for chunk in chunked(enumerate(rows), self.chunk_size):
+                self.save_chunk(chunk)
+                self.rows += len(chunk)
+            if self.created or self.updated:
+                # bulk-операции не шлют post_save; кэш сбрасывается после коммита
+                bump_generation()
+        seconds = time.monotonic() - started
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'errors': self.errors,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds, 1) if seconds else None,
+        }
+
+    def row_id(self, row):
+        if isinstance(row, dict) and row.get('id') not in (None, ''):
+            return row['id']
+        return None
+
+    def save_chunk(self, chunk):
+        ids = []
+        for index, row in chunk:
+            try:
+                row_id = self.row_id(row)
+                if row_id is not None:
+                    ids.append(int(row_id))
+            except (TypeError, ValueError):
+                pass
+        existing = Product.objects.in_bulk(ids)
+
+        to_create, to_update, update_fields = [], [], set()
+        for index, row in chunk:
+            row_id = self.row_id(row)
+            try:
+                if row_id is None:
+                    data = self.create_child.run_validation(row)
+                    to_create.append(Product(**data))
+                    continue
+                instance = existing.get(int(row_id))
+                if instance is None:
+                    raise serializers.ValidationError({'id': ['Товар не найден']})
+                data = self.update_child.run_validation(row)
+            except (TypeError, ValueError):
+                self.errors.append({'index': index, 'errors': {'id': ['Некорректный id']}})
+                continue
+            except serializers.ValidationError as exc:
+                self.errors.append({'index': index, 'errors': exc.detail})
+                continue
+            for field, value in data.items():
+                setattr(instance, field, value)
+            update_fields.update(data)
+            to_update.append(instance)
+
+        if to_create:
+            Product.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        if to_update:
+            now = timezone.now()
+            for instance in to_update:
+                instance.updated_at = now
+            update_fields.add('updated_at')
+            Product.objects.bulk_update(to_update, sorted(update_fields), batch_size=self.chunk_size)
+            collection_cache.invalidate_for_products(instance.pk for instance in to_update)
+        self.created += len(to_create)
+        self.updated += len(to_update)
@@ -0,0 +1,96 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+# Поколение каталога: меняется при любом изменении товаров и подборок.
+# Входит в ключи кэша, поэтому старые ответы просто перестают находиться.
+GENERATION_KEY = 'shop:catalogue:generation'
+
+
+def get_generation():
+    # начальное значение от времени, чтобы после вытеснения ключа
+    # поколение не совпало с одним из уже использованных
+    cache.add(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = int(time.time() * 1000)
+    return generation
+
+
+def incr_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def bump_generation(using=None, **kwargs):
+    """Сбрасывает закэшированные ответы каталога. Подходит как обработчик сигнала."""
+    """ Поколение меняется после коммита транзакции: иначе GET между incr и коммитом
+    прочитал бы старые строки и закэшировал их под новым поколением.
+    Вне транзакции сбрасывает сразу."""
+    transaction.on_commit(incr_generation, using=using)
+
+
+def normalize_query(query_params):
+    """Одинаковые наборы параметров в разном порядке дают одинаковый ключ."""
+    items = sorted(
+        (key, value)
+        for key in query_params
+        for value in query_params.getlist(key)
+    )
+    return urlencode(items)
+
+
+class CachedResponseMixin:
+    """Кэширует GET-ответы list / retrieve и отдаёт ETag."""
+    """ Ответ зависит только от параметров запроса и поколения каталога,
+    поэтому ETag считается без обращения к БД и к закэшированным данным."""
+
+    cache_timeout = None
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, 'SHOP_RESPONSE_CACHE_TIMEOUT', 300)
+
+    def get_response_cache_key(self, request):
+        parts = [
+            self.basename,
+            self.action,
+            str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')),
+            request.accepted_renderer.format,
+            normalize_query(request.query_params),
+        ]
+        digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+        return 'shop:response:%s:%s' % (get_generation(), digest)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        etag = '"%s"' % hashlib.sha1(key.encode('ascii')).hexdigest()
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, self.get_cache_timeout())
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,230 @@
+import datetime
+import decimal
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+
+from .cache import get_generation
+from .models import Product
+from .readers import RowReader
+
+# Снимок каталога в памяти процесса: id, название, цена и даты товаров
+# в массивах, отсортированных по id. Отвечает на карточки товаров и списки
+# с фильтром по цене без запросов к БД, если сериализатор выводит только эти поля.
+# Изменения подтягиваются по updated_at при смене поколения каталога (shop.cache)
+# и не реже чем раз в SHOP_CATALOGUE_SNAPSHOT_MAX_AGE секунд.
+
+COLUMNS = ('id', 'title', 'price', 'created_at', 'updated_at')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+CENTS = decimal.Decimal(100)
+
+
+def to_micros(value):
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + datetime.timedelta(microseconds=value)
+
+
+def to_cents(value):
+    return int(value * CENTS)
+
+
+class SnapshotState:
+    """Неизменяемое состояние снимка; обновление собирает новое и подменяет ссылку."""
+
+    def __init__(self, ids, titles, prices, created, updated):
+        self.ids = ids
+        self.titles = titles
+        self.prices = prices
+        self.created = created
+        self.updated = updated
+        # позиции, отсортированные по (цена, id), для диапазонов цен
+        self.by_price = array('q', sorted(range(len(ids)), key=lambda position: (prices[position], ids[position])))
+        self.sorted_prices = array('q', (prices[position] for position in self.by_price))
+        self.checksum = (len(ids), sum(ids))
+
+    @classmethod
+    def from_rows(cls, rows):
+        ids, titles, prices, created, updated = array('q'), [], array('q'), array('q'), array('q')
+        for row_id, title, price, created_at, updated_at in rows:
+            ids.append(row_id)
+            titles.append(title)
+            prices.append(to_cents(price))
+            created.append(to_micros(created_at))
+            updated.append(to_micros(updated_at))
+        return cls(ids, titles, prices, created, updated)
+
+    def rows(self):
+        return zip(self.ids, self.titles, self.prices, self.created, self.updated)
+
+    def merged(self, changes):
+        """Новое состояние с изменёнными и добавленными строками (в формате rows())."""
+        ids, titles, prices = array('q', self.ids), list(self.titles), array('q', self.prices)
+        created, updated = array('q', self.created), array('q', self.updated)
+        inserted = []
+        for row in changes:
+            position = self.position(row[0])
+            if position is None:
+                inserted.append(row)
+                continue
+            titles[position], prices[position], created[position], updated[position] = row[1:]
+        inserted.sort()
+        if inserted and ids and inserted[0][0] < ids[-1]:
+            # новые id в середине диапазона (например, после загрузки фикстуры) - пересортировка
+            rows = sorted(list(zip(ids, titles, prices, created, updated)) + inserted)
+            ids, titles, prices, created, updated = (array('q'), [], array('q'), array('q'), array('q'))
+            inserted = rows
+        for row_id, title, price, created_at, updated_at in inserted:
+            ids.append(row_id)
+            titles.append(title)
+            prices.append(price)
+            created.append(created_at)
+            updated.append(updated_at)
+        return SnapshotState(ids, titles, prices, created, updated)
+
+    def position(self, row_id):
+        position = bisect_left(self.ids, row_id)
+        if position < len(self.ids) and self.ids[position] == row_id:
+            return position
+        return None
+
+    def price_range(self, low=None, high=None):
+        """Позиции товаров с low <= цена <= high (в копейках) в порядке id."""
+        start = 0 if low is None else bisect_left(self.sorted_prices, low)
+        stop = len(self.sorted_prices) if high is None else bisect_right(self.sorted_prices, high)
+        return sorted(self.by_price[start:stop])
+
+    def value(self, column, position):
+        if column == 'id':
+            return self.ids[position]
+        if column == 'title':
+            return self.titles[position]
+        if column == 'price':
+            return decimal.Decimal(self.prices[position]).scaleb(-2)
+        if column == 'created_at':
+            return from_micros(self.created[position])
+        return from_micros(self.updated[position])
+
+
+class CatalogueSnapshot:
+
+    def __init__(self):
+        self.state = None
+        self.generation = None
+        self.checked = 0.0
+        self.watermark = None
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.state = None
+            self.generation = None
+            self.watermark = None
+
+    def current(self):
+        """Актуальное состояние: при смене поколения или по таймауту - догрузка изменений."""
+        generation = get_generation()
+        max_age = getattr(settings, 'SHOP_CATALOGUE_SNAPSHOT_MAX_AGE', 5)
+        state = self.state
+        if state is not None and generation == self.generation and time.monotonic() - self.checked < max_age:
+            return state
+        with self.lock:
+            if self.state is None:
+                self.rebuild()
+            elif generation != self.generation or time.monotonic() - self.checked >= max_age:
+                self.refresh()
+            self.generation = generation
+            self.checked = time.monotonic()
+            return self.state
+
+    def queryset(self):
+        return Product.objects.order_by('id').values_list(*COLUMNS)
+
+    def rebuild(self):
+        self.state = SnapshotState.from_rows(self.queryset().iterator(chunk_size=10000))
+        self.watermark = max(self.state.updated, default=None)
+
+    def refresh(self):
+        # строки, изменённые незадолго до прошлой загрузки, перечитываются ещё раз:
+        # updated_at ставится до коммита, транзакция могла завершиться позже
+        overlap = getattr(settings, 'SHOP_CATALOGUE_SNAPSHOT_OVERLAP', 5)
+        changes = self.queryset()
+        if self.watermark is not None:
+            since = from_micros(self.watermark) - datetime.timedelta(seconds=overlap)
+            changes = changes.filter(updated_at__gte=since)
+        state = SnapshotState.from_rows(changes)
+        merged = self.state.merged(state.rows()) if len(state.ids) else self.state
+        # удаления не видны по updated_at: сверяем число и сумму id
+        totals = Product.objects.aggregate(count=Count('id'), ids=Sum('id'), updated=Max('updated_at'))
+        if merged.checksum != (totals['count'], totals['ids'] or 0):
+            self.rebuild()
+            return
+        self.state = merged
+        if totals['updated'] is not None:
+            self.watermark = to_micros(totals['updated'])
+
+
+catalogue = CatalogueSnapshot()
+
+
+def is_enabled():
+    return getattr(settings, 'SHOP_CATALOGUE_SNAPSHOT', False)
+
+
+def compile_reader(serializer):
+    """RowReader для сериализатора или None, если ему нужны поля не из снимка."""
+    reader = RowReader.compile(serializer)
+    if reader is None or not set(reader.columns) <= set(COLUMNS):
+        return None
+    return reader
+
+
+def build(reader, state, position):
+    return reader.build(tuple(state.value(column, position) for column in reader.columns))
+
+
+def retrieve(serializer, pk):
+    """Карточка товара из снимка или None (нет в снимке / нужны другие поля)."""
+    reader = compile_reader(serializer)
+    if reader is None:
+        return None
+    state = catalogue.current()
+    position = state.position(pk)
+    if position is None:
+        return None
+    return build(reader, state, position)
+
+
+def price_bound(value):
+    """Граница диапазона в копейках; ValueError, если БД могла бы сравнить её иначе, чем снимок."""
+    field = Product._meta.get_field('price')
+    # за пределами колонки или больше двух знаков после запятой - пусть решает БД
+    if value.adjusted() >= field.max_digits - field.decimal_places:
+        raise ValueError(value)
+    cents = value * CENTS
+    if cents != cents.to_integral_value():
+        raise ValueError(value)
+    return int(cents)
+
+
+def price_list(serializer, price):
+    """Список товаров с ценой в диапазоне price (slice из RangeFilter или None) в порядке id."""
+    reader = compile_reader(serializer)
+    if reader is None:
+        return None
+    low = high = None
+    try:
+        if price is not None and price.start is not None:
+            low = price_bound(price.start)
+        if price is not None and price.stop is not None:
+            high = price_bound(price.stop)
+    except ValueError:
+        return None
+    state = catalogue.current()
+    return [build(reader, state, position) for position in state.price_range(low, high)]
@@ -0,0 +1,120 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Collection
+
+# Краткие карточки товаров подборки (id, название, цена) по страницам
+# (keyset по id товара). Кэшируются отдельные страницы, а не весь состав подборки:
+# чтение страницы не зависит от размера подборки, значения в кэше ограничены
+# размером страницы. Страницы подборки сбрасываются сменой её версии
+# при изменении её состава или товаров в ней, см. shop.signals.
+
+
+def version_key(collection_id):
+    return 'shop:collection:%s:version' % collection_id
+
+
+def page_key(collection_id, version, limit, after):
+    return 'shop:collection:%s:%s:products:%s:%s' % (collection_id, version, limit, after or '')
+
+
+def get_versions(collection_ids):
+    keys = {version_key(collection_id): collection_id for collection_id in collection_ids}
+    versions = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    for key, collection_id in keys.items():
+        if collection_id not in versions:
+            # как у поколения каталога: начальное значение от времени,
+            # чтобы после сброса версия не совпала с прежней
+            initial = int(time.time() * 1000)
+            cache.add(key, initial, timeout=None)
+            versions[collection_id] = cache.get(key, initial)
+    return versions
+
+
+def load_pages(collection_ids, limit, after=None):
+    """Страницы карточек из БД: limit товаров после товара с id = after и курсор следующей."""
+    """ Первый запрос находит для каждой подборки id (limit + 1)-го товара страницы,
+    второй читает диапазоны id до этой границы. Оба идут по индексу
+    (collection_id, product_id) и не читают остальной состав подборки."""
+    memberships = Collection.products.through.objects
+    if after is not None:
+        memberships = memberships.filter(product_id__gt=after)
+    bounds = (
+        Collection.objects
+        .filter(pk__in=collection_ids)
+        .annotate(bound=Subquery(
+            memberships.filter(collection_id=OuterRef('pk'))
+            .order_by('product_id')
+            .values('product_id')[limit:limit + 1]
+        ))
+        .values_list('pk', 'bound')
+    )
+    ranges = Q()
+    for collection_id, bound in bounds:
+        # без границы в подборке не больше limit товаров после after
+        ranges |= Q(collection_id=collection_id) if bound is None else Q(collection_id=collection_id,
+                                                                        product_id__lte=bound)
+
+    loaded = {collection_id: [] for collection_id in collection_ids}
+    if ranges:
+        rows = (
+            memberships.filter(ranges)
+            .order_by('collection_id', 'product_id')
+            .values_list('collection_id', 'product_id', 'product__title', 'product__price')
+        )
+        for collection_id, product_id, title, price in rows:
+            loaded[collection_id].append({'id': product_id, 'title': title, 'price': price})
+
+    pages = {}
+    for collection_id, page in loaded.items():
+        has_next = len(page) > limit
+        page = page[:limit]
+        pages[collection_id] = (page, page[-1]['id'] if has_next else None)
+    return pages
+
+
+def get_pages(collection_ids, limit, after=None):
+    """Возвращает {id подборки: (карточки, курсор следующей страницы)}."""
+    """ Страницы всех подборок читаются из кэша разом, промахи - одним запросом."""
+    versions = get_versions(collection_ids)
+    keys = {
+        page_key(collection_id, versions[collection_id], limit, after): collection_id
+        for collection_id in collection_ids
+    }
+    pages = {keys[key]: tuple(value) for key, value in cache.get_many(keys).items()}
+
+    missing = {key: collection_id for key, collection_id in keys.items() if collection_id not in pages}
+    if missing:
+        loaded = load_pages(list(missing.values()), limit, after)
+        cache.set_many(
+            {key: loaded[collection_id] for key, collection_id in missing.items()},
+            getattr(settings, 'SHOP_COLLECTION_CACHE_TIMEOUT', 3600),
+        )
+        pages.update(loaded)
+    return pages
+
+
+def invalidate(collection_ids, using=None):
+    """Сбрасывает страницы подборок после коммита текущей транзакции."""
+    """ До коммита параллельный запрос прочитал бы старый состав
+    и закэшировал его под новой версией."""
+    keys = [version_key(collection_id) for collection_id in collection_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys), using=using)
+
+
+def invalidate_for_products(product_ids, using=None):
+    """Сбрасывает кэш всех подборок, в которые входят товары."""
+    """ Подборки ищутся сразу (при удалении товара связи потом удаляются каскадом),
+    сброс - после коммита."""
+    collection_ids = set(
+        Collection.products.through.objects
+        .using(using)
+        .filter(product_id__in=list(product_ids))
+        .values_list('collection_id', flat=True)
+    )
+    invalidate(collection_ids, using)
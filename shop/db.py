@@ -0,0 +1,26 @@
+import time
+
+from django.db import connections
+
+# Проверка постоянных соединений (CONN_MAX_AGE > 0).
+# Соединение, простоявшее между запросами дольше HEALTH_CHECK_INTERVAL секунд,
+# перед новым запросом проверяется и закрывается, если сервер его уже оборвал;
+# тогда Django откроет новое при первом обращении к БД.
+
+
+def mark_idle(**kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.shop_idle_since = now
+
+
+def check_connections(**kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        interval = connection.settings_dict.get('HEALTH_CHECK_INTERVAL')
+        idle_since = getattr(connection, 'shop_idle_since', None)
+        if connection.connection is None or interval is None or idle_since is None:
+            continue
+        if now - idle_since >= interval and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,65 @@
+import csv
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ProductsInOrder
+from .utils import chunked
+
+ORDER_FIELDS = ['id', 'creator', 'status', 'total_amount', 'created_at', 'updated_at']
+
+
+def iter_orders(queryset, chunk_size=2000):
+    """Отдаёт заказы по одному, читая их курсором пачками по chunk_size."""
+    """ Позиции подгружаются одним запросом на пачку, поэтому память не растёт
+    с количеством заказов."""
+
+    rows = (
+        queryset
+        .order_by('id')
+        .values(*ORDER_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in chunked(rows, chunk_size):
+        items = defaultdict(list)
+        lines = (
+            ProductsInOrder.objects
+            .filter(order_id__in=[row['id'] for row in chunk])
+            .order_by('id')
+            .values_list('order_id', 'product_id', 'quantity')
+        )
+        for order_id, product_id, quantity in lines:
+            items[order_id].append({'product': product_id, 'quantity': quantity})
+        for row in chunk:
+            row['items'] = items[row['id']]
+            yield row
+
+
+def ndjson_lines(orders):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for order in orders:
+        yield encoder.encode(order) + '\n'
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    writer = csv.writer(Echo())
+    yield writer.writerow(ORDER_FIELDS + ['items'])
+    for order in orders:
+        items = ' '.join('%(product)s:%(quantity)s' % item for item in order['items'])
+        yield writer.writerow(
+            [order[name].isoformat() if name in ('created_at', 'updated_at') else order[name]
+             for name in ORDER_FIELDS] + [items]
+        )
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
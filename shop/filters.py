@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters, ChoiceFilter, DateFromToRangeFilter, RangeFilter, CharFilter
 from shop.models import Product, Review, Order
+from shop.search import search_products
 
 
 class ProductFilter(filters.FilterSet):
@@ -9,6 +10,16 @@ class ProductFilter(filters.FilterSet):
     price = RangeFilter(field_name='price')
     title = CharFilter(field_name='title', lookup_expr='icontains')
     description = CharFilter(field_name='description', lookup_expr='icontains')
+    # полнотекстовый поиск по названию и описанию с сортировкой по релевантности
+    q = CharFilter(method='search')
+    ordering = filters.OrderingFilter(
+        fields=(
+            ('price', 'price'),
+            ('avg_grade', 'avg_grade'),
+            ('review_count', 'review_count'),
+            ('created_at', 'created_at'),
+        ),
+    )
 
     class Meta:
         model = Product
@@ -18,6 +29,9 @@ class ProductFilter(filters.FilterSet):
             'description',
         ]
 
+    def search(self, queryset, name, value):
+        return search_products(queryset, value)
+
 
 class ReviewFilter(filters.FilterSet):
     """Фильтр для отзывов к товарам."""
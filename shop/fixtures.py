@@ -0,0 +1,237 @@
+import gzip
+import json
+import time
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import analytics, collection_cache, pricing, ratings
+from .cache import bump_generation
+from .models import Collection, Order, ProductsInOrder, Review
+
+# Потоковая загрузка фикстур в формате dumpdata (JSON-массив объектов).
+# В отличие от loaddata объекты не сохраняются по одному: они копятся пачками
+# по моделям и вставляются одним INSERT на пачку, сигналы post_save не отправляются.
+
+
+class FixtureError(ValueError):
+    pass
+
+
+def open_fixture(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_json_array(stream, chunk_size=1 << 16):
+    """Читает JSON-массив объектов из потока по одному объекту."""
+    """ В памяти держится только текущий объект и непрочитанный хвост буфера,
+    поэтому размер файла не ограничен."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def read_more(size=chunk_size):
+        nonlocal buffer, position, eof
+        chunk = stream.read(size)
+        buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+    def next_char():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            read_more()
+
+    if next_char() != '[':
+        raise FixtureError('Фикстура должна быть JSON-массивом')
+    position += 1
+    if next_char() == ']':
+        return
+    while True:
+        if next_char() != '{':
+            raise FixtureError('Элементы фикстуры должны быть объектами')
+        size = chunk_size
+        while True:
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+                break
+            except ValueError as exc:
+                if eof:
+                    raise FixtureError('Ошибка разбора фикстуры: %s' % exc)
+                # объект не поместился в буфер: дочитываем порциями всё большего размера
+                read_more(size)
+                size *= 2
+        yield item
+        separator = next_char()
+        if separator == ']':
+            return
+        if separator != ',':
+            raise FixtureError('Ожидалась запятая или конец массива')
+        position += 1
+
+
+def model_parents(model):
+    """Модели, на которые ссылаются внешние ключи model (кроме неё самой)."""
+    return {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is not model
+    }
+
+
+class FixtureLoader:
+    """Загрузка объектов фикстуры пачками, одним INSERT на пачку."""
+    """ Объекты копятся по моделям (и по промежуточным таблицам many-to-many).
+    Перед записью пачки модели записываются накопленные пачки моделей, на которые
+    она ссылается, так что родители по возможности попадают в БД раньше детей.
+    Всё выполняется в одной транзакции с отложенной проверкой внешних ключей,
+    как в loaddata, поэтому ссылки вперёд по файлу тоже допустимы."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=5000, exclude=(), ignore_conflicts=False,
+                 ignorenonexistent=False, progress=None, progress_every=5.0):
+        self.using = using
+        self.batch_size = batch_size
+        self.exclude = set(exclude)
+        self.ignore_conflicts = ignore_conflicts
+        self.ignorenonexistent = ignorenonexistent
+        self.progress = progress
+        self.progress_every = progress_every
+        self.pending = {}
+        self.counts = {}
+        self.collection_ids = set()
+        self.rows = 0
+        self.started = None
+        self.reported = None
+
+    def is_excluded(self, label):
+        app_label = label.split('.')[0]
+        return label in self.exclude or app_label in self.exclude
+
+    def filter_excluded(self, items):
+        for item in items:
+            if not isinstance(item.get('model'), str):
+                raise FixtureError('У объекта фикстуры нет поля model')
+            if not self.is_excluded(item['model'].lower()):
+                yield item
+
+    def load(self, items):
+        """Загружает объекты из итератора словарей формата dumpdata, возвращает статистику."""
+        self.started = self.reported = time.monotonic()
+        connection = connections[self.using]
+        objects = serializers.deserialize(
+            'python', self.filter_excluded(items), using=self.using,
+            ignorenonexistent=self.ignorenonexistent, handle_forward_references=True,
+        )
+        with transaction.atomic(using=self.using), connection.constraint_checks_disabled():
+            for deserialized in objects:
+                if deserialized.deferred_fields:
+                    raise FixtureError('Ссылки по natural key вперёд по файлу не поддерживаются: %s'
+                                       % deserialized.object)
+                self.add(deserialized.object)
+                for field_name, values in (deserialized.m2m_data or {}).items():
+                    self.add_m2m(deserialized.object, field_name, values)
+            for model in list(self.pending):
+                self.flush(model)
+            # для БД без отложенных ограничений, как в loaddata
+            connection.check_constraints(table_names=[model._meta.db_table for model in self.counts])
+            self.reset_sequences(connection)
+        return self.stats()
+
+    def add(self, obj):
+        model = type(obj)
+        if model is Collection:
+            self.collection_ids.add(obj.pk)
+        batch = self.pending.setdefault(model, [])
+        batch.append(obj)
+        if len(batch) >= self.batch_size:
+            self.flush(model)
+
+    def add_m2m(self, obj, field_name, values):
+        field = type(obj)._meta.get_field(field_name)
+        through = field.remote_field.through
+        source = through._meta.get_field(field.m2m_field_name()).attname
+        target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        if field.related_model is Collection:
+            self.collection_ids.update(values)
+        for value in values:
+            self.add(through(**{source: obj.pk, target: value}))
+
+    def flush(self, model, flushing=None):
+        batch = self.pending.get(model)
+        if not batch:
+            return
+        flushing = flushing or set()
+        flushing.add(model)
+        for parent in model_parents(model):
+            if parent not in flushing:
+                self.flush(parent, flushing)
+        self.pending[model] = []
+        self.insert(model, batch)
+        self.counts[model] = self.counts.get(model, 0) + len(batch)
+        self.rows += len(batch)
+        now = time.monotonic()
+        if self.progress and now - self.reported >= self.progress_every:
+            self.reported = now
+            self.progress(self.rows, self.rows / (now - self.started))
+
+    def insert(self, model, batch):
+        """bulk_create в режиме raw, как save_base(raw=True) в loaddata."""
+        """ pre_save полей не вызывается, поэтому auto_now / auto_now_add
+        не затирают created_at и updated_at из дампа текущим временем.
+        Текущее время ставится, только если в фикстуре даты нет."""
+        connection = connections[self.using]
+        manager = model._base_manager.using(self.using)
+        fields = model._meta.concrete_fields
+        auto_fields = [field for field in fields if getattr(field, 'auto_now', False)
+                       or getattr(field, 'auto_now_add', False)]
+        for obj in batch:
+            for field in auto_fields:
+                if getattr(obj, field.attname) is None:
+                    field.pre_save(obj, add=True)
+        with_pk = [obj for obj in batch if obj.pk is not None]
+        without_pk = [obj for obj in batch if obj.pk is None]
+        groups = [
+            (with_pk, fields),
+            (without_pk, [field for field in fields if field is not model._meta.auto_field]),
+        ]
+        for objs, insert_fields in groups:
+            # ограничение на число параметров запроса, как в bulk_create
+            size = max(connection.ops.bulk_batch_size(insert_fields, objs), 1)
+            for start in range(0, len(objs), size):
+                manager._insert(objs[start:start + size], fields=insert_fields, using=self.using,
+                                raw=True, ignore_conflicts=self.ignore_conflicts)
+
+    def reset_sequences(self, connection):
+        # объекты вставлены со своими pk - счётчики автоинкремента нужно сдвинуть
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(self.counts))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for line in sequence_sql:
+                    cursor.execute(line)
+
+    def stats(self):
+        seconds = time.monotonic() - self.started
+        return {
+            'rows': self.rows,
+            'models': {model._meta.label_lower: count for model, count in sorted(
+                self.counts.items(), key=lambda item: item[0]._meta.label_lower)},
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds, 1) if seconds else None,
+        }
+
+    def refresh_derived(self):
+        """Пересчитывает то, что в обычном сохранении обновляют сигналы."""
+        loaded = set(self.counts)
+        if Review in loaded:
+            ratings.rebuild_ratings()
+        if ProductsInOrder in loaded:
+            # в старых дампах у позиций нет цены
+            pricing.price_lines(ProductsInOrder.objects.filter(price__isnull=True))
+        if loaded & {Order, ProductsInOrder}:
+            analytics.refresh_days()
+        if any(model._meta.app_label == 'shop' for model in loaded):
+            bump_generation()
+            collection_cache.invalidate(self.collection_ids)
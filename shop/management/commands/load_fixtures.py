@@ -0,0 +1,49 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+from shop.fixtures import FixtureError, FixtureLoader, iter_json_array, open_fixture
+
+
+class Command(BaseCommand):
+    help = 'Быстрая потоковая загрузка фикстуры dumpdata (JSON, можно .gz) пачками INSERT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', help='Путь к файлу фикстуры')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('-e', '--exclude', action='append', default=[],
+                            help='Пропустить приложение или модель (app_label или app_label.ModelName)')
+        parser.add_argument('-i', '--ignorenonexistent', action='store_true',
+                            help='Пропускать поля, которых нет в моделях')
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help='Пропускать объекты, которые уже есть в БД')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересчитывать рейтинги, сводные таблицы продаж и кэш каталога')
+
+    def handle(self, *args, **options):
+        loader = FixtureLoader(
+            using=options['database'],
+            batch_size=options['batch_size'],
+            exclude=[label.lower() for label in options['exclude']],
+            ignore_conflicts=options['ignore_conflicts'],
+            ignorenonexistent=options['ignorenonexistent'],
+            progress=self.report_progress,
+        )
+        try:
+            with open_fixture(options['fixture']) as stream:
+                stats = loader.load(iter_json_array(stream))
+        except (OSError, FixtureError, DeserializationError, FieldDoesNotExist, DatabaseError) as exc:
+            raise CommandError('Фикстура не загружена: %s' % exc)
+        if not options['skip_rebuild']:
+            loader.refresh_derived()
+        for label, count in stats['models'].items():
+            self.stdout.write('%s: %d' % (label, count))
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено объектов: %d за %.1f с (%s в секунду)'
+            % (stats['rows'], stats['seconds'], stats['rows_per_second'])
+        ))
+
+    def report_progress(self, rows, rows_per_second):
+        self.stdout.write('... %d объектов, %.0f в секунду' % (rows, rows_per_second))
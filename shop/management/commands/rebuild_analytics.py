@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shop.analytics import refresh_days
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводные таблицы продаж по исходным заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('days', nargs='*', help='Дни в формате YYYY-MM-DD, по умолчанию - все')
+
+    def handle(self, *args, **options):
+        refresh_days(options['days'] or None)
+        self.stdout.write(self.style.SUCCESS('Сводные таблицы пересчитаны'))
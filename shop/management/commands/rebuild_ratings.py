@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shop.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает среднюю оценку, количество отзывов и гистограмму оценок товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Обновлено товаров с отзывами: %d' % updated))
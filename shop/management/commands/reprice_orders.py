@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from shop.analytics import refresh_days
+from shop.models import Order
+from shop.pricing import reprice_open_orders, reprice_orders
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает суммы открытых заказов по текущим ценам товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересчитать в том числе закрытые заказы')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            updated = reprice_orders(Order.objects.all())
+            # выручка закрытых заказов в сводных таблицах считается по ценам позиций
+            refresh_days()
+        else:
+            updated = reprice_open_orders()
+        self.stdout.write(self.style.SUCCESS('Пересчитано заказов: %d' % updated))
@@ -0,0 +1,130 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Метрики запросов в памяти процесса: на каждый эндпоинт (ViewSet.action)
+# счётчики и гистограмма времени ответа. Каждый воркер считает своё,
+# данные сбрасываются при перезапуске.
+
+# верхние границы корзин гистограммы, мс; последняя корзина - всё, что дольше
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class QueryTimer:
+    """Обёртка для connection.execute_wrapper: считает запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+@contextmanager
+def serializing(request):
+    """Добавляет время блока к времени сериализации запроса (без запросов к БД внутри блока)."""
+    """ request - HttpRequest или Request DRF; без request.shop_metrics ничего не замеряет."""
+    metrics = getattr(request, 'shop_metrics', None)
+    if metrics is None:
+        yield
+        return
+    started, db_seconds = time.perf_counter(), metrics.timer.seconds
+    try:
+        yield
+    finally:
+        # ListSerializer читает queryset внутри .data - время в БД считается отдельно
+        metrics.serialize_seconds += (time.perf_counter() - started) - (metrics.timer.seconds - db_seconds)
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.serialize_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, sample):
+        self.requests += 1
+        if sample['status'] >= 500:
+            self.errors += 1
+        self.total_ms += sample['total_ms']
+        self.max_ms = max(self.max_ms, sample['total_ms'])
+        self.db_ms += sample['db_ms']
+        self.render_ms += sample['render_ms']
+        self.serialize_ms += sample['serialize_ms']
+        self.queries += sample['queries']
+        self.max_queries = max(self.max_queries, sample['queries'])
+        self.bytes += sample['bytes'] or 0
+        self.buckets[bisect_left(BUCKETS_MS, sample['total_ms'])] += 1
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попадает перцентиль (None - дольше последней)."""
+        rank = fraction * self.requests
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / requests, 3),
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'avg_db_ms': round(self.db_ms / requests, 3),
+            'avg_serialize_ms': round(self.serialize_ms / requests, 3),
+            'avg_render_ms': round(self.render_ms / requests, 3),
+            'avg_queries': round(self.queries / requests, 2),
+            'max_queries': self.max_queries,
+            'avg_bytes': round(self.bytes / requests),
+            'histogram': {
+                **{'le_%d' % bound: count for bound, count in zip(BUCKETS_MS, self.buckets)},
+                'inf': self.buckets[-1],
+            },
+        }
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, sample):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.add(sample)
+
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self.endpoints.items())}
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+registry = Registry()
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import QueryTimer, registry
+
+
+class RequestMetrics:
+    """Замеры одного запроса, живут в request.shop_metrics."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.endpoint = None
+        self.timer = QueryTimer()
+        self.serialize_seconds = 0.0
+        self.render_started = None
+        self.render_seconds = 0.0
+
+    def render_done(self, response):
+        self.render_seconds = time.perf_counter() - self.render_started
+
+
+def endpoint_name(request, view_func):
+    """ViewSet.action для DRF, модуль.функция для остальных вьюх."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return '%s.%s' % (view_func.__module__, view_func.__name__)
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return '%s.%s' % (view_class.__name__, actions.get(method, method))
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """Считает для каждого запроса число SQL-запросов, время в БД, сериализации, рендеринга и размер ответа."""
+    """ Сериализация - время в serializer.data сериализаторов магазина и в быстром чтении
+    списков (см. shop.metrics.serializing), рендеринг - перевод готовых данных в JSON.
+    Цифры отдаются в заголовке Server-Timing и копятся в shop.metrics.registry
+    (см. /api/v1/metrics/). Запросы, выполненные при отдаче потокового ответа, не учитываются.
+    Под ASGI запросы к БД выполняются в потоках вьюх, поэтому считаются только там,
+    где вьюха подключает request.shop_metrics.timer сама (см. shop.async_views).
+    Отключается настройкой SHOP_REQUEST_METRICS = False."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHOP_REQUEST_METRICS', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = request.shop_metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics.timer):
+            response = self.get_response(request)
+        return self.finish(metrics, response)
+
+    async def __acall__(self, request):
+        metrics = request.shop_metrics = RequestMetrics()
+        response = await self.get_response(request)
+        return self.finish(metrics, response)
+
+    def finish(self, metrics, response):
+        total_ms = (time.perf_counter() - metrics.started) * 1000
+        sample = {
+            'status': response.status_code,
+            'total_ms': total_ms,
+            'db_ms': metrics.timer.seconds * 1000,
+            'serialize_ms': metrics.serialize_seconds * 1000,
+            'render_ms': metrics.render_seconds * 1000,
+            'queries': metrics.timer.count,
+            'bytes': None if response.streaming else len(response.content),
+        }
+        response['Server-Timing'] = (
+            'db;dur=%.3f;desc="%d queries", serialize;dur=%.3f, render;dur=%.3f, total;dur=%.3f'
+            % (sample['db_ms'], sample['queries'], sample['serialize_ms'], sample['render_ms'], total_ms)
+        )
+        if metrics.endpoint is not None:
+            registry.record(metrics.endpoint, sample)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.shop_metrics.endpoint = endpoint_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        # DRF Response рендерится после выхода из вьюхи
+        if response.is_rendered:
+            # асинхронные вьюхи рендерят ответ сами и сами замеряют время
+            return response
+        metrics = request.shop_metrics
+        metrics.render_started = time.perf_counter()
+        response.add_post_render_callback(metrics.render_done)
+        return response
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# SQL зафиксирован в миграции: последующие изменения shop.search
+# не должны менять уже применённую схему.
+
+POSTGRES_FORWARD_SQL = [
+    'ALTER TABLE shop_product ADD COLUMN search_vector tsvector',
+    'CREATE INDEX shop_product_search_vector_gin ON shop_product USING GIN (search_vector)',
+    "CREATE TRIGGER shop_product_search_vector_update BEFORE INSERT OR UPDATE OF title, description "
+    "ON shop_product FOR EACH ROW EXECUTE PROCEDURE "
+    "tsvector_update_trigger(search_vector, 'pg_catalog.simple', title, description)",
+    "UPDATE shop_product SET search_vector = to_tsvector('simple', coalesce(title, '') || ' ' || "
+    "coalesce(description, ''))",
+]
+
+POSTGRES_BACKWARD_SQL = [
+    'DROP TRIGGER IF EXISTS shop_product_search_vector_update ON shop_product',
+    'ALTER TABLE shop_product DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD_SQL = [
+    "CREATE VIRTUAL TABLE shop_product_fts USING fts5(title, description, "
+    "content='shop_product', content_rowid='id')",
+    "CREATE TRIGGER shop_product_fts_ai AFTER INSERT ON shop_product BEGIN "
+    "INSERT INTO shop_product_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER shop_product_fts_ad AFTER DELETE ON shop_product BEGIN "
+    "INSERT INTO shop_product_fts(shop_product_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER shop_product_fts_au AFTER UPDATE OF title, description ON shop_product BEGIN "
+    "INSERT INTO shop_product_fts(shop_product_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO shop_product_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "INSERT INTO shop_product_fts(shop_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD_SQL = [
+    'DROP TRIGGER IF EXISTS shop_product_fts_ai',
+    'DROP TRIGGER IF EXISTS shop_product_fts_ad',
+    'DROP TRIGGER IF EXISTS shop_product_fts_au',
+    'DROP TABLE IF EXISTS shop_product_fts',
+]
+
+
+def run_for_vendor(schema_editor, postgres_sql, sqlite_sql):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = postgres_sql
+    elif vendor == 'sqlite':
+        statements = sqlite_sql
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    run_for_vendor(schema_editor, POSTGRES_FORWARD_SQL, SQLITE_FORWARD_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    run_for_vendor(schema_editor, POSTGRES_BACKWARD_SQL, SQLITE_BACKWARD_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_order_total_amount_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.3 on 2026-10-18 16:33
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Q
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    # до уникального ограничения проверка в сериализаторе допускала гонку:
+    # у пары (автор, товар) остаётся последний отзыв, агрегаты товаров пересчитываются
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+    reviews = Review.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        reviews.order_by()
+        .values('creator_id', 'product_id')
+        .annotate(count=Count('id'), last_id=Max('id'))
+        .filter(count__gt=1)
+    )
+    product_ids = set()
+    for row in duplicates.iterator():
+        reviews.filter(creator_id=row['creator_id'], product_id=row['product_id']).exclude(
+            id=row['last_id'],
+        ).delete()
+        product_ids.add(row['product_id'])
+
+    for product_id in product_ids:
+        counters = {'grade_%d_count' % grade: Count('id', filter=Q(grade=grade)) for grade in range(1, 6)}
+        aggregates = reviews.filter(product_id=product_id).aggregate(
+            review_count=Count('id'), avg_grade=Avg('grade'), **counters,
+        )
+        Product.objects.using(schema_editor.connection.alias).filter(pk=product_id).update(**aggregates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['creator', 'created_at'], name='order_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_amount'], name='order_total_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='review_created_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('creator', 'product'), name='review_unique_creator_product'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_line_prices(apps, schema_editor):
+    # для уже существующих позиций лучшее, что есть, - текущая цена товара
+    Product = apps.get_model('shop', 'Product')
+    ProductsInOrder = apps.get_model('shop', 'ProductsInOrder')
+    ProductsInOrder.objects.using(schema_editor.connection.alias).update(
+        price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsinorder',
+            name='price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Цена'),
+        ),
+        migrations.RunPython(fill_line_prices, migrations.RunPython.noop),
+    ]
@@ -30,12 +30,41 @@ class Product(StandardFields):
         verbose_name='Цена',
     )
 
+    # агрегаты по отзывам, поддерживаются в shop.ratings
+    avg_grade = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Средняя оценка',
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество отзывов',
+    )
+    grade_1_count = models.PositiveIntegerField(default=0)
+    grade_2_count = models.PositiveIntegerField(default=0)
+    grade_3_count = models.PositiveIntegerField(default=0)
+    grade_4_count = models.PositiveIntegerField(default=0)
+    grade_5_count = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.title
 
+    @property
+    def grade_histogram(self):
+        return {
+            grade: getattr(self, 'grade_%d_count' % grade)
+            for grade in GradeChoices.values
+        }
+
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        indexes = [
+            # ProductFilter.price
+            models.Index(fields=['price'], name='product_price_idx'),
+            # догрузка изменений в снимок каталога, см. shop.catalogue
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
 
 class GradeChoices(models.IntegerChoices):
@@ -78,6 +107,15 @@ class Review(StandardFields):
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        indexes = [
+            # ReviewFilter: по товару - индекс внешнего ключа, по автору и товару -
+            # уникальный индекс review_unique_creator_product, по дате создания
+            models.Index(fields=['created_at'], name='review_created_idx'),
+        ]
+        constraints = [
+            # 1 пользователь не может оставлять более 1го отзыва на товар
+            models.UniqueConstraint(fields=['creator', 'product'], name='review_unique_creator_product'),
+        ]
 
 
 class Order(StandardFields):
@@ -107,9 +145,11 @@ class Order(StandardFields):
         max_length=12,
     )
 
+    # считается на сервере по позициям заказа, см. shop.pricing
     total_amount = models.DecimalField(
         max_digits=10,
-        decimal_places=2
+        decimal_places=2,
+        default=0,
     )
 
     @admin.display(description='Количество товаров')
@@ -119,6 +159,15 @@ class Order(StandardFields):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            # список заказов пользователя
+            models.Index(fields=['creator', 'created_at'], name='order_creator_created_idx'),
+            # OrderFilter: статус, суммы и даты
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+            models.Index(fields=['total_amount'], name='order_total_amount_idx'),
+        ]
 
 
 class ProductsInOrder(models.Model):
@@ -129,10 +178,24 @@ class ProductsInOrder(models.Model):
         blank=False,
         null=False,
     )
+    # цена товара на момент оформления (у открытых заказов обновляется пересчётом, см. shop.pricing);
+    # по ней считаются сумма заказа и выручка в аналитике
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        editable=False,
+        verbose_name='Цена',
+    )
 
     def __str__(self):
         return '{0}_{1}'.format(self.order, self.product)
 
+    def save(self, *args, **kwargs):
+        if self.price is None:
+            self.price = self.product.price
+        super().save(*args, **kwargs)
+
 
 class Collection(StandardFields):
 
@@ -159,3 +222,48 @@ class Collection(StandardFields):
         verbose_name = 'Подборка'
         verbose_name_plural = 'Подборки'
 
+
+
+class SalesRollup(models.Model):
+    """Продажи (закрытые заказы) по товару за день."""
+
+    day = models.DateField(verbose_name='День')
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        verbose_name='Товар',
+    )
+    orders = models.IntegerField(default=0, verbose_name='Заказов')
+    units = models.IntegerField(default=0, verbose_name='Продано единиц')
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Выручка',
+    )
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='sales_rollup_day_product'),
+        ]
+
+
+class OrderStatusRollup(models.Model):
+    """Количество заказов в каждом статусе по дню создания."""
+
+    day = models.DateField(verbose_name='День')
+    status = models.CharField(
+        choices=Order.OrderStatus.choices,
+        max_length=12,
+    )
+    orders = models.IntegerField(default=0, verbose_name='Заказов')
+
+    class Meta:
+        verbose_name = 'Заказы по статусу за день'
+        verbose_name_plural = 'Заказы по статусам и дням'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='order_status_rollup_day_status'),
+        ]
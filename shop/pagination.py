@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset (cursor) пагинация по (created_at, id)."""
+    """ Включается только если в запросе есть cursor или page_size,
+    иначе список отдаётся целиком, как раньше. Курсор работает только в своём порядке,
+    поэтому запрос с другой сортировкой (?ordering=, поиск ?q=) отклоняется с 400."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering_conflict_message = 'Постраничный вывод (cursor / page_size) нельзя совмещать с другой сортировкой'
+    ordering = ('created_at', 'id')
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 100
+        self.max_page_size = getattr(settings, 'SHOP_MAX_PAGE_SIZE', 1000)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_ordering(self, view):
+        # у пользователя нет created_at, поэтому вьюха может задать свои поля
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def check_ordering(self, queryset, view):
+        """Сортировка от фильтров (?ordering=, ?q=) молча заменилась бы порядком курсора."""
+        requested = tuple(queryset.query.order_by)
+        allowed = {(), tuple(self.ordering_fields)}
+        if view is not None:
+            allowed.add(tuple(view.get_queryset().query.order_by))
+        if requested not in allowed:
+            raise ValidationError({'ordering': [self.ordering_conflict_message]})
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return min(self.page_size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        values = [
+            self.fields[name].value_to_string(obj)
+            for name in self.ordering_fields
+        ]
+        data = json.dumps(values, separators=(',', ':')).encode('ascii')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.ordering_fields):
+                raise ValueError
+            return [
+                self.fields[name].to_python(value)
+                for name, value in zip(self.ordering_fields, values)
+            ]
+        except (TypeError, ValueError, UnicodeEncodeError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def keyset_filter(self, values):
+        """(a, b) > (x, y)  ->  a > x OR (a = x AND b > y)"""
+        condition = Q()
+        for position, name in enumerate(self.ordering_fields):
+            equal = {
+                field: value
+                for field, value in zip(self.ordering_fields[:position], values[:position])
+            }
+            condition |= Q(**equal, **{'%s__gt' % name: values[position]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_fields = self.get_ordering(view)
+        self.check_ordering(queryset, view)
+        opts = queryset.model._meta
+        self.fields = {
+            name: opts.pk if name in ('id', 'pk') else opts.get_field(name)
+            for name in self.ordering_fields
+        }
+
+        queryset = queryset.order_by(*self.ordering_fields)
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.keyset_filter(self.decode_cursor(encoded)))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
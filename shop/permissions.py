@@ -29,4 +29,9 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.creator == request.user
 
 
+# Аналитика доступна только админам, в том числе на чтение.
+class IsSuperUser(permissions.BasePermission):
+    message = 'Требуются права администратора'
 
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
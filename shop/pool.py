@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+# Пул соединений с БД внутри процесса.
+# Соединение берётся из пула при открытии соединения Django и возвращается
+# в пул вместо закрытия, поэтому запросы не тратят время на установку соединения.
+# Пул не зависит от драйвера: connect() создаёт DB-API соединение.
+
+
+class PoolTimeout(Exception):
+    """Все соединения заняты дольше timeout секунд."""
+
+
+def ping(connection):
+    """Проверяет соединение запросом SELECT 1."""
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+def discard(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул: не больше max_size соединений, min_size создаются сразу."""
+    """ Свободное соединение, простоявшее дольше check_interval секунд,
+    перед выдачей проверяется ping(); неработающее закрывается и заменяется новым.
+    check_interval = None отключает проверку."""
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=10, check_interval=30):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.condition = threading.Condition()
+        # свободные соединения: (соединение, когда вернули в пул)
+        self.idle = []
+        self.size = 0
+        for _ in range(min_size):
+            self.idle.append((self.connect(), time.monotonic()))
+            self.size += 1
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                while self.idle:
+                    connection, returned_at = self.idle.pop()
+                    if self.is_healthy(connection, returned_at):
+                        return connection
+                    discard(connection)
+                    self.size -= 1
+                if self.size < self.max_size:
+                    # место резервируется до соединения, чтобы не превысить max_size
+                    self.size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout('Нет свободных соединений за %s с' % self.timeout)
+                self.condition.wait(remaining)
+        try:
+            return self.connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+
+    def is_healthy(self, connection, returned_at):
+        if getattr(connection, 'closed', False):
+            return False
+        if self.check_interval is None or time.monotonic() - returned_at < self.check_interval:
+            return True
+        return ping(connection)
+
+    def putconn(self, connection, broken=False):
+        """Возвращает соединение в пул; broken - закрыть его вместо возврата."""
+        if not broken:
+            try:
+                # незавершённая транзакция не должна достаться следующему запросу
+                connection.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            discard(connection)
+        with self.condition:
+            if broken:
+                self.size -= 1
+            else:
+                self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            while self.idle:
+                discard(self.idle.pop()[0])
+                self.size -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, params=None, **options):
+    """Пул для alias и параметров подключения в текущем процессе (после fork у воркера создаётся свой)."""
+    """ params входят в ключ: если у alias сменилась БД (тестовая test_*, служебная
+    postgres для _nodb_cursor), соединения берутся из другого пула, а не из пула старой БД."""
+    params_key = tuple(sorted((name, repr(value)) for name, value in (params or {}).items()))
+    key = (os.getpid(), alias, params_key)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, **options)
+        return pool
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, Product, ProductsInOrder
+
+OPEN_STATUSES = [Order.OrderStatus.NEW, Order.OrderStatus.IN_PROGRESS]
+
+
+def line_amount():
+    """quantity * цена позиции (для позиций без сохранённой цены - текущая цена товара)."""
+    return ExpressionWrapper(
+        F('quantity') * Coalesce('price', 'product__price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def order_total_expression():
+    """Сумма quantity * price по позициям заказа одним подзапросом."""
+    amount = DecimalField(max_digits=10, decimal_places=2)
+    totals = (
+        ProductsInOrder.objects
+        .filter(order=OuterRef('pk'))
+        .order_by()
+        .values('order')
+        .annotate(total=Sum(line_amount(), output_field=amount))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=amount), Value(Decimal('0.00')), output_field=amount)
+
+
+def price_lines(lines):
+    """Проставляет позициям текущие цены товаров одним UPDATE."""
+    return lines.order_by().update(
+        price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1]),
+    )
+
+
+def reprice_orders(queryset):
+    """Пересчитывает цены позиций и total_amount у всех заказов queryset по текущим ценам."""
+    price_lines(ProductsInOrder.objects.filter(order__in=queryset.order_by().values('pk')))
+    return queryset.order_by().update(total_amount=order_total_expression())
+
+
+def update_order_total(order):
+    """Пересчитывает сумму одного заказа после изменения его позиций."""
+    """ Цены проставляются только новым позициям без цены, у остальных сохраняется
+    цена на момент оформления: правка закрытого заказа не меняет его выручку."""
+    price_lines(ProductsInOrder.objects.filter(order=order, price__isnull=True))
+    orders = Order.objects.filter(pk=order.pk)
+    orders.update(total_amount=order_total_expression())
+    order.total_amount = orders.values_list('total_amount', flat=True).get()
+    return order.total_amount
+
+
+def reprice_open_orders():
+    """Пересчитывает суммы всех новых и находящихся в обработке заказов."""
+    return reprice_orders(Order.objects.filter(status__in=OPEN_STATUSES))
@@ -0,0 +1,111 @@
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Q, When
+from django.db.models.functions import Cast
+
+from .cache import bump_generation
+from .models import Product, Review, GradeChoices
+
+
+def grade_field(grade):
+    return 'grade_%d_count' % grade
+
+
+GRADE_FIELDS = [grade_field(grade) for grade in GradeChoices.values]
+
+
+def histogram(*counts):
+    """Гистограмма оценок из значений колонок GRADE_FIELDS, как Product.grade_histogram."""
+    return dict(zip(GradeChoices.values, counts))
+
+
+def _average_expression():
+    grade_sum = sum(
+        (F(grade_field(grade)) * grade for grade in GradeChoices.values[1:]),
+        F(grade_field(GradeChoices.values[0])) * GradeChoices.values[0],
+    )
+    return Case(
+        When(review_count=0, then=None),
+        default=Cast(grade_sum, FloatField()) / F('review_count'),
+        output_field=FloatField(),
+    )
+
+
+def apply_review_delta(product_id, grade, delta):
+    """Изменяет счётчики товара на delta отзывов с оценкой grade."""
+    """ Вызывается из сигналов отзыва (см. shop.signals) внутри транзакции, которая
+    создаёт / меняет / удаляет отзыв. Счётчики меняются через F(), поэтому параллельные
+    отзывы не теряются. Отзывы, записанные без сигналов (bulk_create, update(), loaddata),
+    учитываются только после rebuild_ratings."""
+
+    products = Product.objects.filter(pk=product_id)
+    products.update(**{
+        name: F(name) + delta
+        for name in ('review_count', grade_field(grade))
+    })
+    # средняя считается по уже обновлённым счётчикам
+    products.update(avg_grade=_average_expression())
+    # update() не шлёт post_save, сбрасываем кэш каталога сами
+    bump_generation()
+
+
+def review_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """pre_save отзыва: запоминает товар и оценку из БД, разницу применит review_saved."""
+    instance._ratings_before = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'product', 'product_id', 'grade'} & set(update_fields):
+        return
+    instance._ratings_before = (
+        Review.objects.filter(pk=instance.pk).values_list('product_id', 'grade').first()
+    )
+
+
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    """post_save отзыва: из API, из админки или через ORM."""
+    before = instance.__dict__.pop('_ratings_before', None)
+    after = (instance.product_id, instance.grade)
+    # без before и не created: сохранены только поля, не влияющие на агрегаты
+    if raw or (before is None and not created) or before == after:
+        return
+    if before is not None:
+        apply_review_delta(*before, -1)
+    apply_review_delta(*after, 1)
+
+
+def review_deleted(sender, instance, **kwargs):
+    """post_delete отзыва, в том числе каскадом при удалении пользователя / товара."""
+    apply_review_delta(instance.product_id, instance.grade, -1)
+
+
+def rebuild_ratings(batch_size=1000):
+    """Пересчитывает агрегаты по отзывам для всех товаров."""
+    """ Возвращает количество товаров, у которых есть отзывы."""
+
+    counters = {
+        grade_field(grade): Count('id', filter=Q(grade=grade))
+        for grade in GradeChoices.values
+    }
+    rows = (
+        Review.objects
+        .order_by()
+        .values('product_id')
+        .annotate(review_count=Count('id'), avg_grade=Avg('grade'), **counters)
+        .iterator(chunk_size=batch_size)
+    )
+    fields = ['avg_grade', 'review_count'] + GRADE_FIELDS
+    updated = 0
+
+    with transaction.atomic():
+        Product.objects.update(avg_grade=None, review_count=0, **{name: 0 for name in GRADE_FIELDS})
+        batch = []
+        for row in rows:
+            batch.append(Product(pk=row.pop('product_id'), **row))
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_update(batch, fields)
+            updated += len(batch)
+    bump_generation()
+    return updated
@@ -0,0 +1,149 @@
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+# Быстрое чтение списков: строки .values_list() превращаются в словари
+# напрямую, без создания моделей и без обхода полей сериализатора на каждую строку.
+# План чтения строится по уже настроенному сериализатору (с учётом ?fields= и ?expand=),
+# а преобразование значений повторяет to_representation полей DRF.
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.decimal_places is None or field.localize or not coerce_to_string:
+        return field.to_representation
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(quantum, rounding=rounding, context=context))
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+# точный тип поля DRF -> фабрика преобразования значения
+CONVERTERS = {
+    serializers.IntegerField: lambda field: int,
+    serializers.FloatField: lambda field: float,
+    serializers.CharField: lambda field: str,
+    serializers.DecimalField: decimal_converter,
+    serializers.DateTimeField: datetime_converter,
+}
+
+
+def field_converter(field):
+    factory = CONVERTERS.get(type(field))
+    if factory is None:
+        return field.to_representation
+    return factory(field)
+
+
+class Unsupported(Exception):
+    """Поле нельзя прочитать из колонок, нужен обычный сериализатор."""
+
+
+class RowReader:
+    """Сериализует строки запроса так же, как переданный сериализатор."""
+    """ Поддерживаются поля-колонки, первичные ключи связей, вложенные сериализаторы
+    по ForeignKey и поля из row_attributes сериализатора. Для остальных
+    compile() возвращает None."""
+
+    def __init__(self):
+        self.columns = []
+
+    @classmethod
+    def compile(cls, serializer):
+        reader = cls()
+        try:
+            reader.build = reader.plan(serializer, serializer.Meta.model, '')
+        except Unsupported:
+            return None
+        return reader
+
+    def column(self, name):
+        self.columns.append(name)
+        return len(self.columns) - 1
+
+    def plan(self, serializer, model, prefix):
+        opts = model._meta
+        getters = []
+        for field in serializer._readable_fields:
+            name = field.field_name
+            build = getattr(serializer, 'row_attributes', {}).get(name)
+            if build is not None:
+                getters.append((name, self.attribute_getter(serializer, field, prefix, build)))
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise Unsupported(name)
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                raise Unsupported(name)
+            if not model_field.concrete or model_field.many_to_many:
+                raise Unsupported(name)
+            if isinstance(field, serializers.BaseSerializer):
+                if not model_field.many_to_one or getattr(field, 'many', False):
+                    raise Unsupported(name)
+                getters.append((name, self.nested_getter(field, model_field, prefix)))
+            elif isinstance(field, serializers.RelatedField):
+                if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.pk_field is not None:
+                    raise Unsupported(name)
+                getters.append((name, self.value_getter(prefix + field.source, None)))
+            else:
+                getters.append((name, self.value_getter(prefix + field.source, field_converter(field))))
+
+        def build(row):
+            return {name: getter(row) for name, getter in getters}
+        return build
+
+    def value_getter(self, column, convert):
+        index = self.column(column)
+        if convert is None:
+            return lambda row: row[index]
+
+        def getter(row):
+            value = row[index]
+            return None if value is None else convert(value)
+        return getter
+
+    def nested_getter(self, field, model_field, prefix):
+        index = self.column(prefix + model_field.name)
+        build = self.plan(field, model_field.related_model, '%s%s__' % (prefix, model_field.name))
+
+        def getter(row):
+            return None if row[index] is None else build(row)
+        return getter
+
+    def attribute_getter(self, serializer, field, prefix, build):
+        indexes = [self.column(prefix + source) for source in serializer.field_sources[field.field_name]]
+        convert = field.to_representation
+
+        def getter(row):
+            value = build(*(row[index] for index in indexes))
+            return None if value is None else convert(value)
+        return getter
+
+    def read(self, queryset):
+        build = self.build
+        return [build(row) for row in queryset.values_list(*self.columns)]
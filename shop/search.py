@@ -0,0 +1,58 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+# Полнотекстовый индекс товаров по названию и описанию.
+# PostgreSQL: колонка search_vector (tsvector) + GIN-индекс, обновляется триггером.
+# SQLite: внешняя FTS5-таблица shop_product_fts, синхронизируется триггерами.
+# Схема создаётся миграцией 0004_product_search (SQL зафиксирован в ней).
+
+SEARCH_CONFIG = 'simple'
+FTS_TABLE = 'shop_product_fts'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_query(text):
+    """Превращает пользовательский ввод в безопасный FTS5-запрос: все слова через AND."""
+    return ' '.join('"%s"' % word for word in WORD_RE.findall(text))
+
+
+def search_products(queryset, text):
+    """Фильтрует товары по поисковому запросу и сортирует по релевантности."""
+    """ Релевантность доступна в аннотации search_rank (больше - лучше)."""
+
+    vendor = connections[queryset.db].vendor
+    table = Product._meta.db_table
+
+    if vendor == 'postgresql':
+        tsquery = "plainto_tsquery('{c}', %s)".format(c=SEARCH_CONFIG)
+        matches = RawSQL('"{t}"."search_vector" @@ {q}'.format(t=table, q=tsquery),
+                         [text], output_field=BooleanField())
+        rank = RawSQL('ts_rank("{t}"."search_vector", {q})'.format(t=table, q=tsquery),
+                      [text], output_field=FloatField())
+        return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', 'id')
+
+    if vendor == 'sqlite':
+        query = fts5_query(text)
+        if not query:
+            return queryset.none()
+        matches = RawSQL('SELECT rowid FROM {f} WHERE {f} MATCH %s'.format(f=FTS_TABLE), [query])
+        # rank в FTS5 - это bm25, чем меньше, тем релевантнее
+        rank = RawSQL(
+            'SELECT -rank FROM {f} WHERE {f} MATCH %s AND rowid = "{t}"."id"'.format(f=FTS_TABLE, t=table),
+            [query], output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank).order_by('-search_rank', 'id')
+
+    # остальные бэкенды: обычный поиск по вхождению всех слов
+    words = WORD_RE.findall(text)
+    if not words:
+        return queryset.none()
+    for word in words:
+        queryset = queryset.filter(Q(title__icontains=word) | Q(description__icontains=word))
+    return queryset
@@ -1,9 +1,98 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Product, Review, Order, Collection
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, transaction
+from .models import Product, Review, Order, Collection, ProductsInOrder
+from . import analytics, collection_cache, metrics, pricing, ratings
+from .authentication import add_user_claims
 
 
-class UserSerializer(serializers.ModelSerializer):
+def query_list(request, name):
+    """?name=a,b&name=c -> ['a', 'b', 'c']"""
+    if request is None:
+        return []
+    values = []
+    for value in request.query_params.getlist(name):
+        values += [item.strip() for item in value.split(',') if item.strip()]
+    return values
+
+
+class TimedDataMixin:
+    """Время построения .data корневого сериализатора попадает в метрики запроса."""
+
+    @property
+    def data(self):
+        with metrics.serializing(self.context.get('request')):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """Список с замером времени; задаётся в Meta.list_serializer_class сериализаторов магазина."""
+
+
+class SparseFieldsMixin(TimedDataMixin):
+    """Общий механизм ?fields= и ?expand= для сериализаторов магазина."""
+    """ fields - оставить только перечисленные поля (только для GET-запросов);
+    expand - развернуть поля из expandable_fields во вложенные объекты.
+    Параметры читает только корневой сериализатор, которому передан request.
+    Тот же список полей можно передать в конструктор: Serializer(fields=[...])."""
+
+    # поле -> (класс сериализатора, аргументы)
+    expandable_fields = {}
+    # поле -> поля модели, которые нужны для его вывода (если это не source поля)
+    field_sources = {}
+    # поле -> функция, собирающая значение атрибута из колонок field_sources
+    # (для быстрого чтения списков, см. shop.readers)
+    row_attributes = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        # request может быть заглушкой без method (см. benchmarks/order_update.py)
+        safe = getattr(request, 'method', None) in ('GET', 'HEAD', 'OPTIONS')
+        if fields is None and safe:
+            fields = query_list(request, 'fields')
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if safe:
+            for name in query_list(request, 'expand'):
+                if name in self.expandable_fields and name in self.fields:
+                    serializer_class, options = self.expandable_fields[name]
+                    self.fields[name] = serializer_class(read_only=True, **options)
+
+    def get_query_fields(self):
+        """Поля модели для .only() и связи для .select_related().
+
+        Возвращает None, если выводимые поля нельзя однозначно сопоставить с колонками."""
+        opts = self.Meta.model._meta
+        only, related = {opts.pk.name}, []
+        for field in self.fields.values():
+            sources = self.field_sources.get(field.field_name)
+            if sources is None:
+                if field.source == '*':
+                    return None
+                sources = [field.source.split('.')[0]]
+            for source in sources:
+                try:
+                    model_field = opts.get_field(source)
+                except FieldDoesNotExist:
+                    return None
+                if not model_field.concrete or model_field.many_to_many:
+                    continue
+                only.add(source)
+                if model_field.many_to_one and (
+                        isinstance(field, serializers.BaseSerializer) or '.' in field.source):
+                    related.append(source)
+        return sorted(only), related
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer для пользователя."""
 
     class Meta:
@@ -11,80 +100,314 @@ class UserSerializer(serializers.ModelSerializer):
         fields = '__all__'
         # fields = ('id', 'username', 'first_name',
         #           'last_name',)
+        list_serializer_class = TimedListSerializer
+
+
+# публичные поля пользователя для вложенного вывода
+PUBLIC_USER_FIELDS = ['id', 'username', 'first_name', 'last_name']
+
+
+class ProductSummarySerializer(serializers.Serializer):
+    """Краткая карточка товара."""
+
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
 
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
-class ProductSerializer(serializers.ModelSerializer):
+    field_sources = {'grade_histogram': ratings.GRADE_FIELDS}
+    row_attributes = {'grade_histogram': ratings.histogram}
+
+    grade_histogram = serializers.DictField(
+        child=serializers.IntegerField(),
+        read_only=True,
+    )
 
     class Meta:
         model = Product
-        fields = ['id', 'title', 'description', 'price', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'price', 'created_at', 'updated_at',
+                  'avg_grade', 'review_count', 'grade_histogram']
+        read_only_fields = ['avg_grade', 'review_count']
+        list_serializer_class = TimedListSerializer
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
+    # без хэша пароля, групп и прав
     creator = UserSerializer(
         read_only=True,
+        fields=PUBLIC_USER_FIELDS,
     )
 
+    expandable_fields = {
+        'product': (ProductSummarySerializer, {}),
+    }
+
     class Meta:
         model = Review
         fields = ['id', 'creator', 'product', 'description', 'grade', 'created_at', 'updated_at']
+        list_serializer_class = TimedListSerializer
+
+    duplicate_message = 'You already posted review for this product'
+
+    def is_duplicate(self, creator_id, product_id, exclude_pk=None):
+        """Есть ли другой отзыв автора на товар, т.е. IntegrityError - от review_unique_creator_product."""
+        return Review.objects.filter(creator=creator_id, product=product_id).exclude(pk=exclude_pk).exists()
 
     def create(self, validated_data):
         """Метод для создания"""
         # Простановка значения поля создатель по-умолчанию.
         validated_data["creator"] = self.context["request"].user
-        return super().create(validated_data)
+        try:
+            # агрегаты товара обновляют сигналы отзыва, см. shop.ratings
+            with transaction.atomic():
+                review = super().create(validated_data)
+        except IntegrityError:
+            # параллельный запрос успел создать отзыв после проверки в validate;
+            # остальные нарушения ограничений - не ошибка пользователя
+            if not self.is_duplicate(validated_data['creator'].id, validated_data['product'].id):
+                raise
+            raise serializers.ValidationError(self.duplicate_message)
+        return review
+
+    def update(self, instance, validated_data):
+        """Метод для обновления"""
+        try:
+            with transaction.atomic():
+                review = super().update(instance, validated_data)
+        except IntegrityError:
+            if not self.is_duplicate(instance.creator_id, instance.product_id, exclude_pk=instance.pk):
+                raise
+            raise serializers.ValidationError(self.duplicate_message)
+        return review
 
     def validate(self, data):
         """ Метод для валидации."""
-        """ 1 пользователь не может оставлять более 1го отзыва."""
+        """ 1 пользователь не может оставлять более 1го отзыва.
+        Правило обеспечивает уникальный индекс review_unique_creator_product,
+        проверка здесь нужна только для понятной ошибки при создании."""
+
+        if self.instance is None:
+            creator = self.context["request"].user
+            if Review.objects.filter(creator=creator.id, product=data["product"]).exists():
+                raise serializers.ValidationError(self.duplicate_message)
+        return data
 
-        creator = self.context["request"].user
-        product = data["product"]
-        review_quantity = Review.objects.filter(creator=creator.id, product=product).count()
-        if self.context["request"].method == "POST" and review_quantity >= 1:
-            raise serializers.ValidationError(f'You already posted review for this product')
-        else:
-            return data
 
+class ProductsInOrderSerializer(serializers.ModelSerializer):
+    """Позиция заказа с названием и ценой товара."""
 
-class OrderSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='product.title', read_only=True)
+    # цена позиции, по ней посчитана сумма заказа
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = ProductsInOrder
+        fields = ['product', 'title', 'price', 'quantity']
+        extra_kwargs = {'quantity': {'min_value': 1}}
+
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+
+    expandable_fields = {
+        'creator': (UserSerializer, {'fields': PUBLIC_USER_FIELDS}),
+    }
+    # позиции подгружаются через prefetch_related во вьюхе
+    field_sources = {'items': []}
+
+    items = ProductsInOrderSerializer(
+        source='productsinorder_set',
+        many=True,
+        required=False,
+    )
+
+    # Поля заказа, которые может менять не-админ (всё, кроме статуса).
+    # Список строится один раз при импорте, а не на каждый запрос.
+    user_editable_fields = tuple(
+        field.name for field in Order._meta.concrete_fields
+        if field.editable and not field.primary_key and field.name not in ('status', 'updated_at')
+    )
 
     # status = serializers.ChoiceField(choices=Order.OrderStatus.choices, read_only=True)
 
     class Meta:
         model = Order
-        fields = ['id', 'creator', 'positions', 'status', 'total_amount', 'created_at', 'updated_at']
+        fields = ['id', 'creator', 'positions', 'items', 'status', 'total_amount', 'created_at', 'updated_at']
+        list_serializer_class = TimedListSerializer
         # read_only_fields = ['status']
+        # сумма заказа считается по позициям, см. shop.pricing
+        read_only_fields = ['total_amount']
+
+    def save_items(self, order, items, replace=False):
+        """Сохраняет позиции заказа и пересчитывает его сумму"""
+        if replace:
+            order.productsinorder_set.all().delete()
+        ProductsInOrder.objects.bulk_create(
+            ProductsInOrder(order=order, **item) for item in items
+        )
+        pricing.update_order_total(order)
 
     def create(self, validated_data):
         """Метод для создания заказа"""
         # Простановка значения поля создатель по-умолчанию.
         validated_data["creator"] = self.context["request"].user
-        return super().create(validated_data)
+        items = validated_data.pop('productsinorder_set', [])
+        with transaction.atomic():
+            order = super().create(validated_data)
+            self.save_items(order, items)
+            analytics.order_created(order)
+        return order
 
     """Менять статус заказа могут только админы."""
     def update(self, instance, validated_data):
+        items = validated_data.pop('productsinorder_set', None)
+        with analytics.track_order(instance):
+            order = self.update_instance(instance, validated_data)
+            if items is not None:
+                self.save_items(order, items, replace=True)
+        return order
+
+    def update_instance(self, instance, validated_data):
         user = self.context["request"].user
         if user.is_superuser:
             return super(OrderSerializer, self).update(instance, validated_data)
         else:
-            fields = instance._meta.fields
-            exclude = ['status']
-            for field in fields:
-                field = field.name.split('.')[-1]
-                if field in exclude:
-                    continue
-                exec("instance.%s = validated_data.get(field, instance.%s)" % (field, field))
-            instance.save()
+            # обновляем только переданные поля и только их колонки
+            changed = [name for name in self.user_editable_fields if name in validated_data]
+            for name in changed:
+                setattr(instance, name, validated_data[name])
+            instance.save(update_fields=changed + ['updated_at'])
             return instance
 
 
-class CollectionSerializer(serializers.ModelSerializer):
+class CollectionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Collection
         fields = ['id', 'title', 'description', 'products', 'created_at', 'updated_at']
+        list_serializer_class = TimedListSerializer
+
+
+class ExpandedCollectionListSerializer(TimedListSerializer):
+
+    def to_representation(self, data):
+        # карточки товаров всех подборок страницы берутся из кэша разом,
+        # промахи читаются одним запросом
+        collections = list(data.all() if hasattr(data, 'all') else data)
+        self.child.pages = collection_cache.get_pages(
+            [collection.id for collection in collections],
+            self.context['products_limit'],
+            self.context.get('products_after'),
+        )
+        return super().to_representation(collections)
+
+
+class ExpandedCollectionSerializer(CollectionSerializer):
+    """Подборка с карточками товаров вместо списка id (?expand=products)."""
+    """ Карточки отдаются страницей: products_limit штук после товара с id = products_after,
+    курсор следующей страницы - в поле products_next."""
+
+    products = serializers.SerializerMethodField()
+    products_next = serializers.SerializerMethodField()
+
+    # карточки берутся из кэша подборки, колонки товаров не нужны
+    field_sources = {'products': [], 'products_next': []}
+
+    class Meta(CollectionSerializer.Meta):
+        fields = CollectionSerializer.Meta.fields + ['products_next']
+        list_serializer_class = ExpandedCollectionListSerializer
+
+    pages = None
+
+    def to_representation(self, collection):
+        if self.pages is None or collection.id not in self.pages:
+            self.pages = collection_cache.get_pages(
+                [collection.id],
+                self.context['products_limit'],
+                self.context.get('products_after'),
+            )
+        self.page, self.next_cursor = self.pages[collection.id]
+        return super().to_representation(collection)
+
+    def get_products(self, collection):
+        return ProductSummarySerializer(self.page, many=True).data
+
+    def get_products_next(self, collection):
+        return self.next_cursor
+
+
+class CollectionProductsQuerySerializer(serializers.Serializer):
+    """Параметры страницы товаров в развёрнутой подборке."""
+
+    products_limit = serializers.IntegerField(min_value=1, required=False)
+    products_after = serializers.IntegerField(required=False)
+
+    def validate_products_limit(self, value):
+        return min(value, getattr(settings, 'SHOP_MAX_PAGE_SIZE', 1000))
+
+    def to_internal_value(self, data):
+        values = super().to_internal_value(data)
+        values.setdefault('products_limit', getattr(settings, 'SHOP_COLLECTION_PRODUCTS_LIMIT', 50))
+        return values
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Параметры отчётов: диапазон дней (включительно)."""
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
+class SalesSerializer(serializers.Serializer):
+    """Выручка и проданные единицы."""
+
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    units = serializers.IntegerField()
+
+
+class SalesTotalsSerializer(SalesSerializer):
+    orders = serializers.IntegerField()
+
+
+class ProductSalesSerializer(SalesTotalsSerializer):
+    product = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class CollectionSalesSerializer(SalesSerializer):
+    collection = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class DaySalesSerializer(SalesTotalsSerializer):
+    day = serializers.DateField()
+
+
+class StatusOrdersSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.OrderStatus.choices)
+    orders = serializers.IntegerField()
+
+
+class ShopTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Выдача JWT с claims пользователя для StatelessJWTAuthentication."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
 
+class ShopTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновление JWT: claims перечитываются из БД, заблокированный пользователь новый токен не получает."""
 
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        user = User.objects.filter(
+            **{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}, is_active=True
+        ).first()
+        if user is None:
+            raise AuthenticationFailed('Пользователь не найден или неактивен', code='user_inactive')
+        add_user_claims(refresh, user)
+        attrs['refresh'] = str(refresh)
+        return super().validate(attrs)
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+from rest_framework.authtoken.models import Token
+
+from . import analytics, authentication, collection_cache, db, ratings
+from .cache import bump_generation
+from .models import Product, Collection, Order, Review
+
+CATALOGUE_MODELS = [Product, Collection, Collection.products.through]
+CollectionProducts = Collection.products.through
+
+
+# кэш страниц подборок сбрасывается после коммита, см. collection_cache.invalidate
+
+def product_changed(sender, instance, using=None, **kwargs):
+    collection_cache.invalidate_for_products([instance.pk], using)
+
+
+def collection_changed(sender, instance, using=None, **kwargs):
+    collection_cache.invalidate([instance.pk], using)
+
+
+def membership_saved(sender, instance, using=None, **kwargs):
+    collection_cache.invalidate([instance.collection_id], using)
+
+
+def membership_changed(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if not reverse:
+        # collection.products.add(...) / remove(...) / clear()
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            collection_cache.invalidate([instance.pk], using)
+    elif action in ('post_add', 'post_remove'):
+        # product.collections.add(...) / remove(...)
+        collection_cache.invalidate(pk_set, using)
+    elif action == 'pre_clear':
+        collection_cache.invalidate_for_products([instance.pk], using)
+
+
+def connect_signals():
+    for model in CATALOGUE_MODELS:
+        post_save.connect(bump_generation, sender=model, dispatch_uid='shop_cache_save_%s' % model.__name__)
+        post_delete.connect(bump_generation, sender=model, dispatch_uid='shop_cache_delete_%s' % model.__name__)
+    # add() / remove() / clear() у Collection.products не вызывают post_save у промежуточной таблицы
+    m2m_changed.connect(bump_generation, sender=CollectionProducts, dispatch_uid='shop_cache_m2m')
+
+    # кэш карточек товаров по подборкам
+    post_save.connect(product_changed, sender=Product, dispatch_uid='shop_collection_cache_product_save')
+    # после удаления товара его связи с подборками уже удалены
+    pre_delete.connect(product_changed, sender=Product, dispatch_uid='shop_collection_cache_product_delete')
+    post_delete.connect(collection_changed, sender=Collection, dispatch_uid='shop_collection_cache_delete')
+    post_save.connect(membership_saved, sender=CollectionProducts, dispatch_uid='shop_collection_cache_through_save')
+    post_delete.connect(membership_saved, sender=CollectionProducts,
+                        dispatch_uid='shop_collection_cache_through_delete')
+    m2m_changed.connect(membership_changed, sender=CollectionProducts, dispatch_uid='shop_collection_cache_m2m')
+
+    # сводные таблицы продаж: удаление заказа, в том числе каскадом при удалении пользователя
+    pre_delete.connect(analytics.order_deleted, sender=Order, dispatch_uid='shop_analytics_order_delete')
+
+    # агрегаты отзывов товара: создание, изменение и удаление отзыва любым способом, в том числе каскадом
+    pre_save.connect(ratings.review_saving, sender=Review, dispatch_uid='shop_ratings_review_pre_save')
+    post_save.connect(ratings.review_saved, sender=Review, dispatch_uid='shop_ratings_review_save')
+    post_delete.connect(ratings.review_deleted, sender=Review, dispatch_uid='shop_ratings_review_delete')
+
+    # проверка постоянных соединений с БД после простоя
+    request_started.connect(db.check_connections, dispatch_uid='shop_db_check_connections')
+    request_finished.connect(db.mark_idle, dispatch_uid='shop_db_mark_idle')
+
+    # кэш токенов: удалённый или заменённый токен и изменённый пользователь
+    post_save.connect(authentication.token_changed, sender=Token, dispatch_uid='shop_token_cache_token_save')
+    post_delete.connect(authentication.token_changed, sender=Token, dispatch_uid='shop_token_cache_token_delete')
+    post_save.connect(authentication.user_changed, sender=User, dispatch_uid='shop_token_cache_user_save')
+    post_delete.connect(authentication.user_changed, sender=User, dispatch_uid='shop_token_cache_user_delete')
@@ -25,6 +25,8 @@ router.register('products', views.ProductViewSet, basename='products')
 router.register('product-reviews', views.ReviewViewSet, basename='product-reviews')
 router.register('orders', views.OrderViewSet, basename='orders')
 router.register('product-collections', views.CollectionViewSet, basename='product-collections')
+router.register('analytics', views.AnalyticsViewSet, basename='analytics')
+router.register('metrics', views.MetricsViewSet, basename='metrics')
 
 router.register('all-profiles', UserViewSet, basename='all-profiles')
 router.register('profile/<int:pk>', UserViewSet, basename='profile')
@@ -1,26 +1,141 @@
-from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import IsAuthenticated
-from .permissions import IsOwnerOrReadOnly, ReadOnly, IsAdminUser
-from .models import Product, Review, Order, Collection
-from .serializers import ProductSerializer, ReviewSerializer, OrderSerializer, CollectionSerializer, UserSerializer
+import types
+
+from django.db.models import Prefetch
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.status import HTTP_204_NO_CONTENT
+from rest_framework.viewsets import ModelViewSet, ViewSet
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .permissions import IsOwnerOrReadOnly, ReadOnly, IsAdminUser, IsSuperUser
+from .models import Product, Review, Order, Collection, ProductsInOrder
+from .serializers import ProductSerializer, ReviewSerializer, OrderSerializer, CollectionSerializer, UserSerializer, \
+    ExpandedCollectionSerializer, CollectionProductsQuerySerializer, \
+    AnalyticsQuerySerializer, SalesTotalsSerializer, ProductSalesSerializer, CollectionSalesSerializer, \
+    DaySalesSerializer, StatusOrdersSerializer, ShopTokenObtainPairSerializer, ShopTokenRefreshSerializer
 from .filters import ProductFilter, ReviewFilter, OrderFilter
+from .cache import CachedResponseMixin
+from .bulk import ProductBulkSaver
+from .parsers import NDJSONParser
+from .export import EXPORT_FORMATS, iter_orders
+from .readers import RowReader
+from .metrics import registry, serializing
+from . import analytics, catalogue
 from django.contrib.auth.models import User
 
 
+class SparseFieldsViewMixin:
+    """Сужает SQL под поля, которые реально выводит сериализатор (?fields= / ?expand=)."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        query_fields = getattr(serializer, 'get_query_fields', lambda: None)()
+        if query_fields is None:
+            return queryset
+        only, related = query_fields
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
+
+
+class FastListViewMixin:
+    """Список без создания моделей: строки .values_list() сразу превращаются в словари."""
+    """ Вывод совпадает с сериализатором. Постраничный вывод (?cursor= / ?page_size=)
+    и сериализаторы с неподдерживаемыми полями идут обычным путём.
+    Отключается настройкой SHOP_FAST_LIST_SERIALIZERS = False."""
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'SHOP_FAST_LIST_SERIALIZERS', True):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        reader = RowReader.compile(self.get_serializer())
+        if reader is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+        with serializing(request):
+            return Response(reader.read(queryset))
+
+
+class CatalogueSnapshotViewMixin:
+    """list / retrieve товаров из снимка каталога в памяти процесса (shop.catalogue)."""
+    """ Снимок отвечает, если сериализатор выводит только поля из снимка (например,
+    ?fields=id,title,price), а из фильтров задан только диапазон цен. Остальные запросы,
+    в том числе постраничные, идут в БД. Включается настройкой SHOP_CATALOGUE_SNAPSHOT = True."""
+
+    def snapshot_price_filter(self, request):
+        """Диапазон цен из фильтра (slice или None); ValueError, если снимок не может ответить."""
+        filterset = self.filterset_class(request.query_params, queryset=Product.objects.none(), request=request)
+        if not filterset.is_valid():
+            raise ValueError(filterset.errors)
+        data = filterset.form.cleaned_data
+        if any(value not in (None, '', []) for name, value in data.items() if name != 'price'):
+            raise ValueError(data)
+        return data.get('price')
+
+    def list(self, request, *args, **kwargs):
+        if catalogue.is_enabled() and (self.paginator is None or not self.paginator.is_requested(request)):
+            try:
+                with serializing(request):
+                    data = catalogue.price_list(self.get_serializer(), self.snapshot_price_filter(request))
+            except ValueError:
+                data = None
+            if data is not None:
+                return Response(data)
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if catalogue.is_enabled():
+            try:
+                # с фильтрами карточка может оказаться 404 - это решает БД
+                if self.snapshot_price_filter(request) is not None:
+                    raise ValueError
+                pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+                with serializing(request):
+                    data = catalogue.retrieve(self.get_serializer(), pk)
+            except ValueError:
+                data = None
+            if data is not None:
+                return Response(data)
+        return super().retrieve(request, *args, **kwargs)
+
+
 class UserViewSet(ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related('groups', 'user_permissions')
     serializer_class = UserSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    keyset_ordering = ('date_joined', 'id')
 
 
-class ProductViewSet(ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(CachedResponseMixin, CatalogueSnapshotViewMixin, FastListViewMixin, SparseFieldsViewMixin,
+                     ModelViewSet):
+    # порядок по id, чтобы списки из БД и из снимка каталога совпадали
+    queryset = Product.objects.order_by('id')
     serializer_class = ProductSerializer
     filterset_class = ProductFilter
     permission_classes = [IsAdminUser]
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Массовое создание / обновление товаров из JSON-массива или NDJSON-потока."""
+        rows = request.data
+        # JSON-массив или генератор строк NDJSONParser
+        if not isinstance(rows, (list, types.GeneratorType)):
+            raise ParseError('Ожидается массив товаров')
+        saver = ProductBulkSaver(chunk_size=getattr(settings, 'SHOP_BULK_CHUNK_SIZE', 1000))
+        return Response(saver.save(rows))
+
 
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(FastListViewMixin, SparseFieldsViewMixin, ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     filterset_class = ReviewFilter
@@ -38,7 +153,7 @@ class ReviewViewSet(ModelViewSet):
         return []
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(SparseFieldsViewMixin, ModelViewSet):
 
     queryset = Order.objects.all().defer('status')
     serializer_class = OrderSerializer
@@ -46,15 +161,37 @@ class OrderViewSet(ModelViewSet):
     """ Создавать заказы могут только авторизованные пользователи """
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
+    def get_base_queryset(self):
         """Админы могут получать все заказы, остальное пользователи только свои."""
         if self.request.user.is_superuser:
             return Order.objects.all()
         else:
             return Order.objects.filter(creator=self.request.user)
 
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        # позиции всех заказов страницы загружаются двумя запросами, а не по запросу на заказ
+        return queryset.prefetch_related(
+            Prefetch('positions', queryset=Product.objects.only('id')),
+            Prefetch('productsinorder_set', queryset=ProductsInOrder.objects.select_related('product')),
+        )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка заказов в NDJSON (?output=ndjson) или CSV (?output=csv)."""
+        """ Принимает те же фильтры, что и список заказов."""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ParseError('Неизвестный формат выгрузки: %s' % output)
+        render, content_type = EXPORT_FORMATS[output]
+        queryset = self.filter_queryset(self.get_base_queryset())
+        chunk_size = getattr(settings, 'SHOP_EXPORT_CHUNK_SIZE', 2000)
+        response = StreamingHttpResponse(render(iter_orders(queryset, chunk_size)), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="orders.%s"' % output
+        return response
 
-class CollectionViewSet(ModelViewSet):
+
+class CollectionViewSet(CachedResponseMixin, SparseFieldsViewMixin, ModelViewSet):
 
     """Создавать подборки могут только админы,
     остальные пользователи могут только их смотреть."""
@@ -63,4 +200,85 @@ class CollectionViewSet(ModelViewSet):
     serializer_class = CollectionSerializer
     permission_classes = [IsAdminUser | ReadOnly]
 
+    def expand_products(self):
+        return (
+            self.request.method in SAFE_METHODS
+            and 'products' in self.request.query_params.get('expand', '').split(',')
+        )
+
+    def get_queryset(self):
+        if self.expand_products():
+            # карточки товаров берутся из кэша подборки
+            return self.queryset
+        return self.queryset.prefetch_related(Prefetch('products', queryset=Product.objects.only('id')))
+
+    def get_serializer_class(self):
+        if self.expand_products():
+            return ExpandedCollectionSerializer
+        return CollectionSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.expand_products():
+            params = CollectionProductsQuerySerializer(data=self.request.query_params)
+            params.is_valid(raise_exception=True)
+            context.update(params.validated_data)
+        return context
+
+
+class AnalyticsViewSet(ViewSet):
+
+    """Отчёты по продажам из сводных таблиц (только для админов).
+    Продажами считаются закрытые (DONE) заказы."""
+
+    permission_classes = [IsSuperUser]
+
+    def get_period(self):
+        params = AnalyticsQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+    def report(self, serializer_class, data, many=True):
+        return Response(serializer_class(data, many=many).data)
+
+    def list(self, request):
+        return self.report(SalesTotalsSerializer, analytics.totals(**self.get_period()), many=False)
+
+    @action(detail=False)
+    def products(self, request):
+        return self.report(ProductSalesSerializer, analytics.by_product(**self.get_period()))
+
+    @action(detail=False)
+    def collections(self, request):
+        return self.report(CollectionSalesSerializer, analytics.by_collection(**self.get_period()))
+
+    @action(detail=False)
+    def days(self, request):
+        return self.report(DaySalesSerializer, analytics.by_day(**self.get_period()))
+
+    @action(detail=False)
+    def statuses(self, request):
+        return self.report(StatusOrdersSerializer, analytics.by_status(**self.get_period()))
+
+
+class MetricsViewSet(ViewSet):
+
+    """Статистика запросов этого процесса по эндпоинтам (только для админов)."""
+
+    permission_classes = [IsSuperUser]
+
+    def list(self, request):
+        return Response(registry.snapshot())
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        registry.reset()
+        return Response(status=HTTP_204_NO_CONTENT)
+
+
+class ShopTokenObtainPairView(TokenObtainPairView):
+    serializer_class = ShopTokenObtainPairSerializer
+
 
+class ShopTokenRefreshView(TokenRefreshView):
+    serializer_class = ShopTokenRefreshSerializer
@@ -1,4 +1,7 @@
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from model_bakery import baker
 from rest_framework.authtoken.admin import User
@@ -6,6 +9,9 @@ from django.urls import reverse
 from rest_framework.status import HTTP_201_CREATED
 from rest_framework.authtoken.models import Token
 
+from shop.authentication import token_cache
+from shop.catalogue import catalogue
+
 
 @pytest.fixture
 def client():
@@ -82,3 +88,75 @@ def review_factory():
         return baker.make('Review', **kwargs)
     return factory
 
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # база откатывается после каждого теста, а кэш - нет
+    cache.clear()
+    token_cache.clear()
+    catalogue.reset()
+    yield
+    cache.clear()
+    token_cache.clear()
+    catalogue.reset()
+
+
+# Поиск N+1: list-запрос выполняется на двух объёмах данных,
+# число SQL-запросов не должно расти вместе с числом строк.
+# Замеры всех проверок печатаются в конце прогона.
+QUERY_SCALING_REPORT = []
+
+
+class QueryScaling:
+
+    sizes = (2, 12)
+
+    def __init__(self, client):
+        self.client = client
+
+    def count_queries(self, url, params):
+        # кэш каталога спрятал бы запросы второго вызова
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, params or {})
+        assert resp.status_code == 200, resp.content
+        return [query['sql'] for query in queries]
+
+    def __call__(self, url, make_rows, params=None, sizes=None):
+        """make_rows(n) создаёт ещё n строк, которые попадут в ответ url."""
+        few_size, many_size = sizes or self.sizes
+        make_rows(few_size)
+        few = self.count_queries(url, params)
+        make_rows(many_size - few_size)
+        many = self.count_queries(url, params)
+        QUERY_SCALING_REPORT.append((url, params, few_size, len(few), many_size, len(many)))
+        extra = [sql for sql in many if many.count(sql) > 1 or sql not in few]
+        assert len(many) == len(few), (
+            '%s: %d запросов на %d строк и %d на %d, лишние:\n%s'
+            % (url, len(few), few_size, len(many), many_size, '\n'.join(extra[:5]))
+        )
+        return many
+
+
+@pytest.fixture
+def query_scaling(db, client):
+    return QueryScaling(client)
+
+
+@pytest.fixture
+def admin_query_scaling(db, client, admin_user):
+    # списки админки открываются через сессию
+    client.force_login(admin_user)
+    return QueryScaling(client)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not QUERY_SCALING_REPORT:
+        return
+    terminalreporter.section('SQL-запросы list-эндпоинтов')
+    for url, params, few_size, few, many_size, many in QUERY_SCALING_REPORT:
+        terminalreporter.write_line(
+            '%s %s: %d строк - %d запросов, %d строк - %d запросов'
+            % (url, params or '', few_size, few, many_size, many)
+        )
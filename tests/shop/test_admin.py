@@ -0,0 +1,47 @@
+import pytest
+from django.db import connection
+from django.urls import reverse
+from model_bakery import baker
+
+from shop.admin import EstimatedCountPaginator
+from shop.models import Order, Review
+
+
+# списки админки не делают запросов на каждую строку
+@pytest.mark.parametrize('url, make_rows', [
+    ('admin:shop_order_changelist', lambda n: [
+        baker.make('ProductsInOrder', order=order, _quantity=2) for order in baker.make('Order', _quantity=n)
+    ]),
+    ('admin:shop_review_changelist', lambda n: baker.make('Review', _quantity=n)),
+    ('admin:shop_product_changelist', lambda n: baker.make('Product', _quantity=n)),
+    ('admin:shop_collection_changelist', lambda n: baker.make('Collection', _quantity=n)),
+])
+def test_admin_changelist_queries(admin_query_scaling, url, make_rows):
+    admin_query_scaling(reverse(url), make_rows)
+
+
+# количество товаров в заказе берётся из аннотации
+@pytest.mark.django_db
+def test_admin_order_quantity(admin_client):
+    order = baker.make('Order')
+    baker.make('ProductsInOrder', order=order, _quantity=3)
+    baker.make('Order')
+    resp = admin_client.get(reverse('admin:shop_order_changelist'), {'o': '4'})
+    assert resp.status_code == 200
+    assert [row.positions_count for row in resp.context['cl'].result_list] == [0, 3]
+
+
+# без фильтров число строк берётся из статистики БД, с фильтрами считается точно
+@pytest.mark.django_db
+def test_estimated_count_paginator(settings):
+    baker.make('Review', grade=5, _quantity=3)
+    settings.SHOP_ADMIN_EXACT_COUNT_LIMIT = 1
+    assert EstimatedCountPaginator(Review.objects.order_by('pk'), 100).count == 3
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute("UPDATE sqlite_stat1 SET stat = '5000000 1' WHERE tbl = 'shop_review'")
+    assert EstimatedCountPaginator(Review.objects.order_by('pk'), 100).count == 5000000
+    assert EstimatedCountPaginator(Review.objects.filter(grade=5).order_by('pk'), 100).count == 3
+    settings.SHOP_ADMIN_EXACT_COUNT_LIMIT = 10 ** 7
+    assert EstimatedCountPaginator(Review.objects.order_by('pk'), 100).count == 3
+    assert EstimatedCountPaginator(Order.objects.order_by('pk'), 100).count == 0
@@ -0,0 +1,137 @@
+import decimal
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+from shop import analytics
+from shop.models import Order, Product, ProductsInOrder, SalesRollup, OrderStatusRollup
+
+
+@pytest.fixture
+def done_order(admin_user, admin_test_client, product_factory, collection_factory):
+    # заказ админа на два товара, переведённый в статус DONE
+    apple = product_factory(title='apple', price=decimal.Decimal('10.00'))
+    pear = product_factory(title='pear', price=decimal.Decimal('5.50'))
+    collection_factory(title='fruits', products=[apple, pear])
+    url = reverse("orders-list")
+    order = admin_test_client.post(url, {'creator': admin_user.id, 'items': [
+        {'product': apple.id, 'quantity': 3},
+        {'product': pear.id, 'quantity': 2},
+    ]}, format='json').json()
+    order_url = reverse("orders-detail", args=[order['id']])
+    admin_test_client.patch(order_url, {'status': 'DONE'})
+    return order
+
+
+# сводные таблицы обновляются при закрытии заказа
+@pytest.mark.django_db
+def test_rollups_follow_order_status(admin_test_client, done_order):
+    assert OrderStatusRollup.objects.get(status='DONE').orders == 1
+    assert OrderStatusRollup.objects.get(status='NEW').orders == 0
+    assert SalesRollup.objects.get(product__title='apple').revenue == decimal.Decimal('30.00')
+
+    # заказ вернули в работу - продажи вычитаются
+    order_url = reverse("orders-detail", args=[done_order['id']])
+    admin_test_client.patch(order_url, {'status': 'IN_PROGRESS'})
+    assert SalesRollup.objects.get(product__title='apple').units == 0
+    assert OrderStatusRollup.objects.get(status='IN_PROGRESS').orders == 1
+
+
+# отчёты по товарам, подборкам, дням и статусам
+@pytest.mark.django_db
+def test_analytics_reports(admin_test_client, done_order):
+    today = timezone.localdate().isoformat()
+
+    resp = admin_test_client.get(reverse("analytics-list"))
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json() == {'revenue': '41.00', 'units': 5, 'orders': 1}
+
+    products = admin_test_client.get(reverse("analytics-products")).json()
+    assert [(row['title'], row['revenue'], row['units']) for row in products] == [
+        ('apple', '30.00', 3),
+        ('pear', '11.00', 2),
+    ]
+
+    collections = admin_test_client.get(reverse("analytics-collections")).json()
+    assert collections == [{'collection': collections[0]['collection'], 'title': 'fruits',
+                            'revenue': '41.00', 'units': 5}]
+
+    days = admin_test_client.get(reverse("analytics-days"), {'date_from': today}).json()
+    assert days == [{'day': today, 'revenue': '41.00', 'units': 5, 'orders': 1}]
+    assert admin_test_client.get(reverse("analytics-days"), {'date_to': '2000-01-01'}).json() == []
+
+    statuses = admin_test_client.get(reverse("analytics-statuses")).json()
+    assert {row['status']: row['orders'] for row in statuses}['DONE'] == 1
+
+
+# пересчёт сводных таблиц с нуля даёт те же значения
+@pytest.mark.django_db
+def test_rebuild_analytics(admin_test_client, done_order):
+    before = list(SalesRollup.objects.order_by('product').values('day', 'product', 'orders', 'units', 'revenue'))
+    SalesRollup.objects.all().delete()
+    call_command('rebuild_analytics')
+    after = list(SalesRollup.objects.order_by('product').values('day', 'product', 'orders', 'units', 'revenue'))
+    assert after == before
+
+
+# смена цены товара не сдвигает сводные таблицы: выручка считается по ценам позиций
+@pytest.mark.django_db
+def test_rollups_use_line_prices(admin_test_client, done_order):
+    Product.objects.filter(title='apple').update(price=decimal.Decimal('99.00'))
+    call_command('rebuild_analytics')
+    assert SalesRollup.objects.get(product__title='apple').revenue == decimal.Decimal('30.00')
+
+    order_url = reverse("orders-detail", args=[done_order['id']])
+    admin_test_client.patch(order_url, {'status': 'NEW'})
+    assert SalesRollup.objects.get(product__title='apple').revenue == 0
+    assert SalesRollup.objects.get(product__title='pear').revenue == 0
+
+
+# правка закрытого заказа в админке не переоценивает его позиции по новым ценам
+@pytest.mark.django_db
+def test_admin_edit_keeps_order_revenue(admin_user, admin_client, done_order):
+    Product.objects.filter(title='apple').update(price=decimal.Decimal('99.00'))
+    lines = ProductsInOrder.objects.filter(order_id=done_order['id']).order_by('pk')
+    data = {
+        'creator': admin_user.id,
+        'status': 'DONE',
+        'productsinorder_set-TOTAL_FORMS': len(lines),
+        'productsinorder_set-INITIAL_FORMS': len(lines),
+        'productsinorder_set-MIN_NUM_FORMS': 0,
+        'productsinorder_set-MAX_NUM_FORMS': 1000,
+    }
+    for number, line in enumerate(lines):
+        prefix = 'productsinorder_set-%d-' % number
+        data.update({prefix + 'id': line.pk, prefix + 'order': done_order['id'],
+                     prefix + 'product': line.product_id, prefix + 'quantity': line.quantity})
+    resp = admin_client.post(reverse('admin:shop_order_change', args=[done_order['id']]), data)
+    assert resp.status_code == 302
+
+    assert Order.objects.get(pk=done_order['id']).total_amount == decimal.Decimal('41.00')
+    assert SalesRollup.objects.get(product__title='apple').revenue == decimal.Decimal('30.00')
+
+
+# удаление заказа, в том числе каскадом вместе с пользователем, вычитается из сводных таблиц
+@pytest.mark.django_db
+def test_rollups_follow_order_delete(admin_user, admin_test_client, done_order):
+    admin_test_client.delete(reverse("orders-detail", args=[done_order['id']]))
+    assert SalesRollup.objects.get(product__title='apple').units == 0
+    assert OrderStatusRollup.objects.get(status='DONE').orders == 0
+
+    apple = Product.objects.get(title='apple')
+    order = Order.objects.create(creator=admin_user, status='DONE')
+    ProductsInOrder.objects.create(order=order, product=apple, quantity=4)
+    analytics.order_created(order)
+    assert SalesRollup.objects.get(product=apple).revenue == decimal.Decimal('40.00')
+    admin_user.delete()
+    assert SalesRollup.objects.get(product=apple).revenue == 0
+    assert OrderStatusRollup.objects.get(status='DONE').orders == 0
+
+
+# аналитика недоступна обычным пользователям
+@pytest.mark.django_db
+def test_user_cannot_get_analytics(auth_client):
+    resp = auth_client.get(reverse("analytics-list"))
+    assert resp.status_code == HTTP_403_FORBIDDEN
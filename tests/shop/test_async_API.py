@@ -0,0 +1,96 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import resolve, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+
+from shop.models import Product
+
+ASGI_URLS = 'django_diplom.asgi_urls'
+
+
+def async_request(method, path, *args, **kwargs):
+    async def request():
+        return await getattr(AsyncClient(), method)(path, *args, **kwargs)
+    return async_to_sync(request)()
+
+
+def async_get(path, data=None):
+    # AsyncClient в Django 3.2 теряет data у GET, поэтому строка запроса - в пути
+    if data:
+        path += '?' + urlencode(data)
+    return async_request('get', path)
+
+
+# чтение каталога под ASGI идёт через асинхронные вьюхи, дополнительные действия - через роутер
+@pytest.mark.urls(ASGI_URLS)
+def test_asgi_routes():
+    assert asyncio.iscoroutinefunction(resolve('/api/v1/products/').func)
+    assert asyncio.iscoroutinefunction(resolve('/api/v1/product-reviews/1/').func)
+    assert asyncio.iscoroutinefunction(resolve('/api/v1/product-collections/').func)
+    assert not asyncio.iscoroutinefunction(resolve('/api/v1/products/bulk/').func)
+    assert not asyncio.iscoroutinefunction(resolve('/api/v1/orders/').func)
+
+
+# асинхронный путь отдаёт то же, что и синхронный, и считает запросы к БД
+@pytest.mark.urls(ASGI_URLS)
+@pytest.mark.django_db(transaction=True)
+def test_async_list_and_retrieve(client, product_factory, review_factory, collection_factory):
+    product = product_factory()
+    review_factory(product=product)
+    collection_factory(make_m2m=True)
+    for basename in ('products', 'product-reviews', 'product-collections'):
+        url = reverse('%s-list' % basename)
+        resp = async_get(url)
+        assert resp.status_code == HTTP_200_OK
+        assert json.loads(resp.content) == client.get(url).json()
+
+    resp = async_get(reverse("products-detail", args=[product.id]), {'fields': 'id,title'})
+    assert json.loads(resp.content) == {'id': product.id, 'title': product.title}
+    assert 'desc="1 queries"' in resp['Server-Timing']
+
+
+# запись по тем же адресам работает как раньше
+@pytest.mark.urls(ASGI_URLS)
+@pytest.mark.django_db(transaction=True)
+def test_async_route_create(admin_user):
+    token = Token.objects.create(user=admin_user)
+    resp = async_request(
+        'post',
+        reverse("products-list"),
+        json.dumps({'title': 'Чайник', 'price': '10.00'}),
+        content_type='application/json',
+        authorization='Token %s' % token.key,
+    )
+    assert resp.status_code == HTTP_201_CREATED
+    assert Product.objects.filter(title='Чайник').exists()
+
+
+# приложение из django_diplom.asgi маршрутизирует по asgi_urls
+@pytest.mark.django_db(transaction=True)
+def test_asgi_application(product_factory):
+    from django_diplom.asgi import application
+
+    product_factory(_quantity=2)
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': '/api/v1/products/', 'query_string': b'',
+        'headers': [(b'host', b'testserver')], 'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 0),
+    }
+    async_to_sync(application)(scope, receive, send)
+    assert messages[0]['status'] == HTTP_200_OK
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    assert len(json.loads(body)) == 2
@@ -0,0 +1,156 @@
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_401_UNAUTHORIZED
+
+from shop.authentication import TokenCache
+
+
+def auth_queries(queries):
+    return [query['sql'] for query in queries if 'authtoken_token' in query['sql'] or 'auth_user' in query['sql']]
+
+
+def get_orders(client):
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get(reverse("orders-list"))
+    return resp, auth_queries(queries)
+
+
+def jwt_pair(client):
+    resp = client.post('/auth/jwt/create/', {'username': 'Egg', 'password': 'egg1988Y'})
+    assert resp.status_code == HTTP_200_OK
+    return resp.json()
+
+
+# проверенный токен берётся из кэша, повторный запрос не идёт в БД за токеном
+@pytest.mark.django_db
+def test_token_cached(client, user, token, order_factory):
+    order_factory(creator=user)
+    client.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+    resp, queries = get_orders(client)
+    assert resp.status_code == HTTP_200_OK
+    assert len(queries) == 1
+    resp, queries = get_orders(client)
+    assert resp.status_code == HTTP_200_OK
+    assert len(resp.json()) == 1
+    assert queries == []
+
+
+# удалённый токен и заблокированный пользователь перестают проходить сразу
+@pytest.mark.django_db
+def test_token_cache_invalidation(client, user, token):
+    client.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+    assert client.get(reverse("orders-list")).status_code == HTTP_200_OK
+    token.delete()
+    assert client.get(reverse("orders-list")).status_code == HTTP_401_UNAUTHORIZED
+
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+    assert client.get(reverse("orders-list")).status_code == HTTP_200_OK
+    user.is_active = False
+    user.save()
+    assert client.get(reverse("orders-list")).status_code == HTTP_401_UNAUTHORIZED
+
+
+# кэш ограничен по размеру (вытесняется самая старая запись) и по времени жизни
+def test_token_cache_bounds(monkeypatch):
+    class Stub:
+        def __init__(self, pk):
+            self.pk = pk
+
+    cache = TokenCache(max_size=2, ttl=60)
+    cache.set('a', Stub(1), 'a')
+    cache.set('b', Stub(2), 'b')
+    cache.get('a')
+    cache.set('c', Stub(1), 'c')
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    cache.discard_user(1)
+    assert len(cache) == 0
+
+    cache.set('d', Stub(3), 'd')
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert cache.get('d') is None
+    assert len(cache) == 0
+
+
+# JWT: пользователь собирается из claims без запросов к БД, заказы фильтруются по владельцу
+@pytest.mark.django_db
+def test_jwt_stateless(client, user, order_factory, product_factory, admin_user):
+    order_factory(creator=user)
+    order_factory(creator=admin_user)
+    client.credentials(HTTP_AUTHORIZATION='Bearer %s' % jwt_pair(client)['access'])
+    resp, queries = get_orders(client)
+    assert resp.status_code == HTTP_200_OK
+    assert [order['creator'] for order in resp.json()] == [user.id]
+    assert queries == []
+
+    product = product_factory()
+    resp = client.post(reverse("orders-list"), {
+        'creator': user.id,
+        'items': [{'product': product.id, 'quantity': 1}],
+    }, format='json')
+    assert resp.status_code == HTTP_201_CREATED, resp.content
+    assert resp.json()['creator'] == user.id
+
+
+# обновление JWT перечитывает права пользователя
+@pytest.mark.django_db
+def test_jwt_refresh_claims(client, user, order_factory, admin_user):
+    order_factory(creator=admin_user)
+    pair = jwt_pair(client)
+    user.is_superuser = True
+    user.save()
+    resp = client.post('/auth/jwt/refresh/', {'refresh': pair['refresh']})
+    assert resp.status_code == HTTP_200_OK
+    client.credentials(HTTP_AUTHORIZATION='Bearer %s' % resp.json()['access'])
+    assert len(client.get(reverse("orders-list")).json()) == 1
+
+    user.is_active = False
+    user.save()
+    resp = client.post('/auth/jwt/refresh/', {'refresh': pair['refresh']})
+    assert resp.status_code == HTTP_401_UNAUTHORIZED
+
+
+# запросы на изменение читают пользователя из БД: устаревшие claims JWT не сохраняются
+@pytest.mark.django_db
+def test_jwt_unsafe_methods_use_db(client, user):
+    user.is_staff = user.is_superuser = True
+    user.save()
+    client.credentials(HTTP_AUTHORIZATION='Bearer %s' % jwt_pair(client)['access'])
+    User.objects.filter(pk=user.pk).update(is_staff=False, is_superuser=False)
+
+    resp = client.patch('/auth/users/me/', {'email': 'spam@mail.com'})
+    assert resp.status_code == HTTP_200_OK, resp.content
+    user.refresh_from_db()
+    assert user.email == 'spam@mail.com'
+    assert not user.is_staff and not user.is_superuser
+
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    assert client.patch('/auth/users/me/', {'email': 'ham@mail.com'}).status_code == HTTP_401_UNAUTHORIZED
+    user.refresh_from_db()
+    assert not user.is_active
+
+
+# запросы на изменение не берут пользователя из кэша токенов (он может устареть в других воркерах)
+@pytest.mark.django_db
+def test_token_cache_unsafe_methods_use_db(client, user, token):
+    client.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+    assert client.get(reverse("orders-list")).status_code == HTTP_200_OK
+    # update() не шлёт сигналов: так выглядит изменение, сделанное другим воркером
+    User.objects.filter(pk=user.pk).update(is_staff=True)
+
+    resp = client.patch('/auth/users/me/', {'email': 'spam@mail.com'})
+    assert resp.status_code == HTTP_200_OK, resp.content
+    user.refresh_from_db()
+    assert user.email == 'spam@mail.com'
+    assert user.is_staff
+
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    assert client.patch('/auth/users/me/', {'email': 'ham@mail.com'}).status_code == HTTP_401_UNAUTHORIZED
@@ -0,0 +1,78 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+from shop.cache import get_generation
+
+
+# повторный запрос списка товаров не обращается к БД
+@pytest.mark.django_db
+def test_products_list_is_cached(client, product_factory):
+    product_factory(_quantity=3)
+    url = reverse("products-list")
+    first = client.get(url, {'price_min': 0, 'ordering': 'price'})
+    with CaptureQueriesContext(connection) as queries:
+        # тот же набор параметров в другом порядке
+        second = client.get(url, {'ordering': 'price', 'price_min': 0})
+    assert second.status_code == HTTP_200_OK
+    assert second.json() == first.json()
+    assert len(queries) == 0
+
+
+# изменение товара сбрасывает кэш
+@pytest.mark.django_db
+def test_product_change_invalidates_cache(client, product_factory, django_capture_on_commit_callbacks):
+    product = product_factory(title='before')
+    url = reverse("products-detail", args=[product.id])
+    assert client.get(url).json()['title'] == 'before'
+    product.title = 'after'
+    # поколение каталога меняется после коммита
+    with django_capture_on_commit_callbacks(execute=True):
+        product.save()
+    assert client.get(url).json()['title'] == 'after'
+
+
+# изменение состава подборки сбрасывает кэш
+@pytest.mark.django_db
+def test_collection_products_change_invalidates_cache(client, collection_factory, product_factory,
+                                                     django_capture_on_commit_callbacks):
+    collection = collection_factory()
+    product = product_factory()
+    url = reverse("product-collections-list")
+    assert client.get(url).json()[0]['products'] == []
+    with django_capture_on_commit_callbacks(execute=True):
+        collection.products.add(product)
+    assert client.get(url).json()[0]['products'] == [product.id]
+
+
+# ETag / If-None-Match
+@pytest.mark.django_db
+def test_products_etag(client, product_factory, django_capture_on_commit_callbacks):
+    product_factory()
+    url = reverse("products-list")
+    resp = client.get(url)
+    etag = resp['ETag']
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_304_NOT_MODIFIED
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product_factory()
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == HTTP_200_OK
+    assert resp['ETag'] != etag
+    assert len(resp.json()) == 2
+
+
+# до коммита транзакции поколение не меняется: параллельный GET не закэширует старые строки под новым
+@pytest.mark.django_db
+def test_generation_changes_after_commit(product_factory, django_capture_on_commit_callbacks):
+    generation = get_generation()
+    with django_capture_on_commit_callbacks() as callbacks:
+        product_factory()
+        assert get_generation() == generation
+    assert callbacks
+    for callback in callbacks:
+        callback()
+    assert get_generation() != generation
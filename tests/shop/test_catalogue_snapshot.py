@@ -0,0 +1,95 @@
+import decimal
+import json
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+
+from shop.catalogue import catalogue
+
+SNAPSHOT_FIELDS = 'id,title,price,created_at,updated_at'
+
+
+def get(client, settings, url, params, snapshot):
+    settings.SHOP_CATALOGUE_SNAPSHOT = snapshot
+    # кэш ответов каталога спрятал бы разницу путей
+    cache.clear()
+    resp = client.get(url, params)
+    return resp.status_code, resp.content
+
+
+def assert_same(client, settings, url, params):
+    from_snapshot = get(client, settings, url, params, True)
+    assert from_snapshot == get(client, settings, url, params, False)
+    return from_snapshot
+
+
+@pytest.fixture
+def products(product_factory):
+    prices = ['10.00', '10.50', '10.01', '99.99', '100.00', '5.00', '10.50']
+    return [product_factory(price=decimal.Decimal(price)) for price in prices]
+
+
+# ответы снимка совпадают с ответами из БД побайтно
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {'fields': SNAPSHOT_FIELDS},
+    {'fields': 'id,price', 'price_min': '10.5'},
+    {'fields': 'id,title', 'price_min': '10.01', 'price_max': '100'},
+    {'fields': 'id,title', 'price_max': '10.5'},
+    {'fields': 'id', 'price_min': '10.005'},
+    {'fields': 'id', 'price_min': 'дорого'},
+    {'fields': 'id', 'price_min': '10', 'title': 'а'},
+    {'fields': 'id', 'ordering': '-price'},
+    {},
+])
+def test_snapshot_list_matches_orm(client, settings, products, params):
+    status, content = assert_same(client, settings, reverse("products-list"), params)
+    assert status in (200, 400)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{'fields': SNAPSHOT_FIELDS}, {'fields': 'id,price', 'price_min': '50'}, {}])
+def test_snapshot_retrieve_matches_orm(client, settings, products, params):
+    assert_same(client, settings, reverse("products-detail", args=[products[1].id]), params)
+    assert_same(client, settings, reverse("products-detail", args=[products[-1].id + 100]), params)
+
+
+# прогретый снимок отвечает без запросов к БД
+@pytest.mark.django_db
+def test_snapshot_without_queries(client, settings, products):
+    settings.SHOP_CATALOGUE_SNAPSHOT = True
+    # ответы не кэшируются; очистка кэша сменила бы поколение каталога
+    settings.SHOP_RESPONSE_CACHE_TIMEOUT = 0
+    params = {'fields': 'id,title,price', 'price_min': '10', 'price_max': '11'}
+    client.get(reverse("products-list"), params)
+    with CaptureQueriesContext(connection) as queries:
+        list_resp = client.get(reverse("products-list"), params)
+        detail_resp = client.get(reverse("products-detail", args=[products[0].id]), {'fields': 'id,price'})
+    assert list_resp.status_code == detail_resp.status_code == HTTP_200_OK
+    assert [row['id'] for row in list_resp.json()] == [product.id for product in products[:3]] + [products[-1].id]
+    assert detail_resp.json() == {'id': products[0].id, 'price': '10.00'}
+    assert [query['sql'] for query in queries] == []
+
+
+# изменения товаров догружаются по updated_at, удаления - полной перезагрузкой
+@pytest.mark.django_db
+def test_snapshot_follows_changes(client, admin_test_client, settings, products, product_factory):
+    url, params = reverse("products-list"), {'fields': SNAPSHOT_FIELDS, 'price_max': '50'}
+    assert_same(client, settings, url, params)
+    settings.SHOP_CATALOGUE_SNAPSHOT = True
+
+    admin_test_client.patch(reverse("products-detail", args=[products[0].id]), {'price': '20.00', 'title': 'Чайник'})
+    product_factory(price=decimal.Decimal('1.00'))
+    with CaptureQueriesContext(connection) as queries:
+        get(client, settings, url, params, True)
+    assert any('"updated_at" >=' in query['sql'] for query in queries)
+    assert_same(client, settings, url, params)
+
+    admin_test_client.delete(reverse("products-detail", args=[products[1].id]))
+    status, content = assert_same(client, settings, url, params)
+    assert products[1].id not in [row['id'] for row in json.loads(content)]
+    assert catalogue.state.checksum[0] == len(products)
@@ -1,5 +1,9 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from shop import collection_cache
+from shop.cache import bump_generation
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_403_FORBIDDEN
 
 
@@ -150,3 +154,82 @@ def test_user_cannot_delete_collection(auth_client, collection_factory):
     # если коллекция создана успешно, код будет 200 ОК
     assert resp.status_code == HTTP_403_FORBIDDEN
 
+
+
+# подборка с карточками товаров (?expand=products) и курсором по товарам
+@pytest.mark.django_db
+def test_get_expanded_collections(client, collection_factory, product_factory):
+    products = product_factory(_quantity=5)
+    collection_factory(_quantity=3, products=products)
+    url = reverse("product-collections-list")
+
+    resp = client.get(url, {'expand': 'products', 'products_limit': 2})
+    assert resp.status_code == HTTP_200_OK
+    collection = resp.json()[0]
+    ids = sorted(product.id for product in products)
+    assert [product['id'] for product in collection['products']] == ids[:2]
+    assert set(collection['products'][0]) == {'id', 'title', 'price'}
+    assert collection['products_next'] == ids[1]
+
+    resp = client.get(url, {'expand': 'products', 'products_limit': 2, 'products_after': ids[3]})
+    collection = resp.json()[0]
+    assert [product['id'] for product in collection['products']] == ids[4:]
+    assert collection['products_next'] is None
+
+
+# карточки подборок кэшируются и сбрасываются при изменении состава
+@pytest.mark.django_db
+def test_expanded_collection_cache(client, collection_factory, product_factory, django_capture_on_commit_callbacks):
+    collection = collection_factory(products=product_factory(_quantity=2))
+    url = reverse("product-collections-detail", args=[collection.id])
+    assert len(client.get(url, {'expand': 'products'}).json()['products']) == 2
+
+    # при смене поколения каталога карточки подборки берутся из своего кэша
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_generation()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url, {'expand': 'products'})
+    assert not any('shop_collection_products' in query['sql'] for query in queries)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new_product = product_factory(title='added')
+        new_product.collections.add(collection)
+    titles = [product['title'] for product in client.get(url, {'expand': 'products'}).json()['products']]
+    assert 'added' in titles
+
+    new_product.title = 'renamed'
+    with django_capture_on_commit_callbacks(execute=True):
+        new_product.save()
+    titles = [product['title'] for product in client.get(url, {'expand': 'products'}).json()['products']]
+    assert 'renamed' in titles
+
+
+# до коммита изменения состава подборки её страницы из кэша не сбрасываются
+@pytest.mark.django_db
+def test_expanded_collection_cache_after_commit(collection_factory, product_factory,
+                                                django_capture_on_commit_callbacks):
+    collection = collection_factory(products=product_factory(_quantity=2))
+    assert len(collection_cache.get_pages([collection.id], 10)[collection.id][0]) == 2
+    with django_capture_on_commit_callbacks() as callbacks:
+        collection.products.add(product_factory())
+        assert len(collection_cache.get_pages([collection.id], 10)[collection.id][0]) == 2
+    for callback in callbacks:
+        callback()
+    assert len(collection_cache.get_pages([collection.id], 10)[collection.id][0]) == 3
+
+
+# страницы разных подборок читаются двумя запросами, из БД берётся не больше limit + 1 товаров подборки
+@pytest.mark.django_db
+def test_collection_pages(collection_factory, product_factory):
+    products = sorted(product_factory(_quantity=7), key=lambda product: product.id)
+    ids = [product.id for product in products]
+    big = collection_factory(products=products)
+    small = collection_factory(products=products[:2])
+    empty = collection_factory()
+    with CaptureQueriesContext(connection) as queries:
+        pages = collection_cache.get_pages([big.id, small.id, empty.id], 3, ids[0])
+    assert len([query for query in queries if 'shop_collection_products' in query['sql']]) == 2
+    assert [summary['id'] for summary in pages[big.id][0]] == ids[1:4]
+    assert pages[big.id][1] == ids[3]
+    assert pages[small.id] == ([{'id': ids[1], 'title': products[1].title, 'price': products[1].price}], None)
+    assert pages[empty.id] == ([], None)
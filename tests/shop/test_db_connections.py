@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import ConnectionHandler
+
+from django_diplom.database import POOL_ENGINE, database_settings
+from shop import db
+from shop.pool import ConnectionPool, PoolTimeout, get_pool
+
+
+# по умолчанию SQLite с постоянными соединениями
+def test_database_settings_defaults():
+    database = database_settings({})
+    assert database['ENGINE'] == 'django.db.backends.sqlite3'
+    assert database['CONN_MAX_AGE'] == 60
+    assert database['HEALTH_CHECK_INTERVAL'] == 30
+    assert 'POOL' not in database
+
+
+# пул включается только для PostgreSQL, размеры берутся из окружения
+def test_database_settings_pool():
+    database = database_settings({
+        'DB_ENGINE': 'django.db.backends.postgresql',
+        'DB_POOL': 'on',
+        'DB_POOL_MAX_SIZE': '4',
+        'DB_HEALTH_CHECK_INTERVAL': 'none',
+    })
+    assert database['ENGINE'] == POOL_ENGINE
+    assert database['CONN_MAX_AGE'] == 0
+    assert database['POOL'] == {'MIN_SIZE': 1, 'MAX_SIZE': 4, 'TIMEOUT': 10}
+    assert database['HEALTH_CHECK_INTERVAL'] is None
+
+
+@pytest.mark.parametrize('environ', [
+    {'DB_POOL': '1'},
+    {'DB_CONN_MAX_AGE': 'forever'},
+])
+def test_database_settings_errors(environ):
+    with pytest.raises(ImproperlyConfigured):
+        database_settings(environ)
+
+
+def sqlite_pool(tmp_path, **options):
+    # sqlite3 - DB-API заменитель PostgreSQL для проверки логики пула
+    return ConnectionPool(lambda: sqlite3.connect(str(tmp_path / 'pool.db'), check_same_thread=False), **options)
+
+
+# возвращённое соединение выдаётся повторно, незавершённая транзакция откатывается
+def test_pool_reuses_connections(tmp_path):
+    pool = sqlite_pool(tmp_path, max_size=2)
+    connection = pool.getconn()
+    connection.execute('CREATE TABLE item (id INTEGER)')
+    connection.commit()
+    connection.execute('INSERT INTO item VALUES (1)')
+    pool.putconn(connection)
+
+    again = pool.getconn()
+    assert again is connection
+    assert again.execute('SELECT COUNT(*) FROM item').fetchone() == (0,)
+    assert pool.size == 1
+
+
+# больше max_size соединений не открывается, ожидание ограничено timeout
+def test_pool_timeout(tmp_path):
+    pool = sqlite_pool(tmp_path, max_size=1, timeout=0.05)
+    pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+
+# освободившееся соединение достаётся ждущему потоку
+def test_pool_waits_for_connection(tmp_path):
+    pool = sqlite_pool(tmp_path, max_size=1, timeout=5)
+    connection = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(connection)
+    waiter.join()
+    assert got == [connection]
+
+
+# оборванное соединение после простоя заменяется новым
+def test_pool_health_check(tmp_path):
+    pool = sqlite_pool(tmp_path, max_size=1, check_interval=0)
+    connection = pool.getconn()
+    pool.putconn(connection)
+    connection.close()
+    fresh = pool.getconn()
+    assert fresh is not connection
+    assert fresh.execute('SELECT 1').fetchone() == (1,)
+    assert pool.size == 1
+
+
+class StubConnection:
+    def __init__(self, usable, interval=30):
+        self.connection = object()
+        self.settings_dict = {'HEALTH_CHECK_INTERVAL': interval}
+        self.usable = usable
+        self.closed = False
+
+    def is_usable(self):
+        return self.usable
+
+    def close(self):
+        self.closed = True
+        self.connection = None
+
+
+class StubHandler:
+    def __init__(self, *items):
+        self.items = items
+
+    def all(self):
+        return list(self.items)
+
+
+# постоянное соединение проверяется перед запросом только после простоя
+def test_check_connections(monkeypatch):
+    fresh, stale, broken = StubConnection(False), StubConnection(True), StubConnection(False)
+    monkeypatch.setattr(db, 'connections', StubHandler(fresh, stale, broken))
+    db.mark_idle()
+    stale.shop_idle_since = broken.shop_idle_since = time.monotonic() - 60
+    db.check_connections()
+    assert not fresh.closed
+    assert not stale.closed
+    assert broken.closed
+
+
+# пул выбирается по alias и параметрам подключения: смена БД у alias даёт другой пул
+def test_get_pool_by_params(tmp_path):
+    connect = lambda: sqlite3.connect(str(tmp_path / 'pool.db'), check_same_thread=False)
+    pool = get_pool('pool_test', connect, params={'dbname': 'shop'})
+    assert get_pool('pool_test', connect, params={'dbname': 'shop'}) is pool
+    assert get_pool('pool_test', connect, params={'dbname': 'test_shop'}) is not pool
+    assert get_pool('pool_test', connect, params={'dbname': 'postgres'}) is not pool
+
+
+# настоящий PostgreSQL: SHOP_TEST_POSTGRES_NAME (и при необходимости _HOST/_USER/_PASSWORD)
+@pytest.mark.skipif('SHOP_TEST_POSTGRES_NAME' not in os.environ, reason='нет тестового PostgreSQL')
+def test_postgresql_pool_backend():
+    database = database_settings({
+        'DB_ENGINE': 'django.db.backends.postgresql',
+        'DB_POOL': '1',
+        'DB_NAME': os.environ['SHOP_TEST_POSTGRES_NAME'],
+        'DB_HOST': os.environ.get('SHOP_TEST_POSTGRES_HOST', '127.0.0.1'),
+    }, os.environ.get('SHOP_TEST_POSTGRES_USER', ''), os.environ.get('SHOP_TEST_POSTGRES_PASSWORD', ''))
+    connection = ConnectionHandler({'default': database})['default']
+    connection.ensure_connection()
+    raw = connection.connection
+    connection.close()
+    connection.ensure_connection()
+    assert connection.connection is raw
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        assert cursor.fetchone() == (1,)
+    connection.close()
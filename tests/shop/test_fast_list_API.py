@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK
+
+from shop import ratings
+from shop.models import Product
+from shop.readers import RowReader
+from shop.serializers import CollectionSerializer, ProductSerializer, ReviewSerializer
+
+
+def both_paths(client, settings, url, params=None):
+    """Ответы быстрого и обычного пути на один и тот же запрос."""
+    contents = []
+    for fast in (True, False):
+        settings.SHOP_FAST_LIST_SERIALIZERS = fast
+        cache.clear()
+        resp = client.get(url, params or {})
+        assert resp.status_code == HTTP_200_OK
+        contents.append(resp.content)
+    return contents
+
+
+@pytest.fixture
+def catalogue(db):
+    products = [
+        baker.make(Product, title='Чайник', description='Электрический', price=Decimal('10.5')),
+        baker.make(Product, title='Кружка', price=Decimal('0.01')),
+        baker.make(Product, title='Ваза', price=Decimal('1234.99')),
+    ]
+    baker.make('Review', product=products[0], grade=5, description='Отлично')
+    baker.make('Review', product=products[0], grade=2)
+    baker.make('Review', product=products[1], grade=4)
+    ratings.rebuild_ratings()
+    return products
+
+
+# быстрый путь отдаёт те же байты, что и ProductSerializer
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {},
+    {'fields': 'id,price,grade_histogram'},
+    {'price_min': '1', 'ordering': '-price'},
+    {'q': 'Чайник'},
+])
+def test_products_fast_list_matches(client, settings, catalogue, params):
+    fast, slow = both_paths(client, settings, reverse("products-list"), params)
+    assert fast == slow
+    assert b'"10.50"' in fast
+
+
+# быстрый путь отдаёт те же байты, что и ReviewSerializer
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {},
+    {'expand': 'product'},
+    {'fields': 'id,creator,grade'},
+])
+def test_reviews_fast_list_matches(client, settings, catalogue, params):
+    fast, slow = both_paths(client, settings, reverse("product-reviews-list"), params)
+    assert fast == slow
+
+
+# быстрый путь не создаёт модели и читает одну таблицу с JOIN
+@pytest.mark.django_db
+def test_reviews_fast_list_single_query(client, catalogue, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        resp = client.get(reverse("product-reviews-list"), {'expand': 'product'})
+    assert resp.json()[0]['creator']['username']
+
+
+# поля, которые нельзя прочитать из колонок (m2m), оставляют обычный путь
+def test_row_reader_compile():
+    assert RowReader.compile(ProductSerializer()) is not None
+    assert RowReader.compile(ReviewSerializer()) is not None
+    assert RowReader.compile(CollectionSerializer()) is None
@@ -0,0 +1,45 @@
+import pytest
+from django.urls import reverse
+from model_bakery import baker
+
+
+# число запросов списка товаров не зависит от количества товаров
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'fields': 'id,title'}, {'page_size': 50}])
+def test_products_list_queries(query_scaling, product_factory, params):
+    query_scaling(reverse("products-list"), lambda n: product_factory(_quantity=n), params)
+
+
+# отзывы с авторами и развёрнутыми товарами
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'expand': 'product'}, {'page_size': 50}])
+def test_reviews_list_queries(query_scaling, review_factory, params):
+    query_scaling(reverse("product-reviews-list"), lambda n: review_factory(_quantity=n), params)
+
+
+# заказы с позициями
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'expand': 'creator'}, {'page_size': 50}])
+def test_orders_list_queries(query_scaling, user, auth_client, order_factory, params):
+    query_scaling(
+        reverse("orders-list"),
+        lambda n: order_factory(_quantity=n, make_m2m=True, creator=user),
+        params,
+    )
+
+
+# подборки со списком товаров и с карточками товаров
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'expand': 'products'}])
+def test_collections_list_queries(query_scaling, collection_factory, params):
+    query_scaling(
+        reverse("product-collections-list"),
+        lambda n: collection_factory(_quantity=n, make_m2m=True),
+        params,
+    )
+
+
+# профили пользователей
+@pytest.mark.django_db
+def test_profiles_list_queries(query_scaling):
+    query_scaling(reverse("all-profiles-list"), lambda n: baker.make('auth.User', _quantity=n))
@@ -0,0 +1,102 @@
+import datetime
+import io
+import json
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from shop.fixtures import FixtureError, iter_json_array
+from shop.models import Order, Product, ProductsInOrder, Review
+
+FIXTURE = Path(__file__).resolve().parents[2] / 'fixtures.json'
+# после migrate типы контента и права уже есть в БД
+EXCLUDE = ['contenttypes', 'auth.permission', 'admin', 'sessions']
+
+
+def load(path, *args):
+    out = io.StringIO()
+    call_command('load_fixtures', str(path), *args, *['--exclude=%s' % label for label in EXCLUDE], stdout=out)
+    return out.getvalue()
+
+
+def write_fixture(tmp_path, items):
+    path = tmp_path / 'fixture.json'
+    path.write_text(json.dumps(items), encoding='utf-8')
+    return path
+
+
+# потоковый разбор даёт те же объекты, что и json.load, при любом размере порции
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_iter_json_array(chunk_size):
+    text = FIXTURE.read_text(encoding='utf-8')
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize('text', ['{}', '[{"a": 1} {"b": 2}]', '[{"a": ', '[1]'])
+def test_iter_json_array_errors(text):
+    with pytest.raises(FixtureError):
+        list(iter_json_array(io.StringIO(text), 2))
+
+
+# fixtures.json загружается целиком, агрегаты и счётчики id после загрузки в порядке
+@pytest.mark.django_db(transaction=True)
+def test_load_fixtures():
+    output = load(FIXTURE, '--batch-size=4')
+    expected = Counter(item['model'] for item in json.loads(FIXTURE.read_text(encoding='utf-8')))
+    assert Order.objects.count() == expected['shop.order']
+    assert ProductsInOrder.objects.count() == expected['shop.productsinorder']
+    assert Review.objects.count() == expected['shop.review']
+    assert 'shop.order: %d' % expected['shop.order'] in output
+    assert 'в секунду' in output
+
+    product = Product.objects.filter(review__isnull=False).first()
+    assert product.review_count == product.review_set.count()
+    assert Product.objects.create(title='Новый', price=1).pk > max(
+        item['pk'] for item in json.loads(FIXTURE.read_text(encoding='utf-8')) if item['model'] == 'shop.product'
+    )
+
+
+# ссылки вперёд по файлу допустимы, пачки родителей пишутся раньше детей
+@pytest.mark.django_db(transaction=True)
+def test_load_fixtures_forward_references(tmp_path):
+    path = write_fixture(tmp_path, [
+        {'model': 'shop.productsinorder', 'pk': 1, 'fields': {'order': 1, 'product': 1, 'quantity': 2}},
+        {'model': 'shop.order', 'pk': 1, 'fields': {'creator': 1, 'status': 'NEW', 'total_amount': '0'}},
+        {'model': 'auth.user', 'pk': 1, 'fields': {'username': 'Egg', 'password': '', 'groups': [],
+                                                   'user_permissions': []}},
+        {'model': 'shop.product', 'pk': 1, 'fields': {'title': 'Чайник', 'price': '10.00'}},
+    ])
+    load(path, '--batch-size=1')
+    assert list(Order.objects.values_list('creator__username', 'positions__title')) == [('Egg', 'Чайник')]
+
+
+# даты создания и изменения берутся из фикстуры, а не из времени загрузки
+@pytest.mark.django_db(transaction=True)
+def test_load_fixtures_keeps_dates(tmp_path):
+    dates = {'created_at': '2020-01-01T10:00:00Z', 'updated_at': '2020-02-03T12:30:00Z'}
+    path = write_fixture(tmp_path, [
+        {'model': 'auth.user', 'pk': 1, 'fields': {'username': 'Egg', 'password': '', 'groups': [],
+                                                   'user_permissions': []}},
+        {'model': 'shop.product', 'pk': 1, 'fields': dict(dates, title='Чайник', price='10.00')},
+        {'model': 'shop.order', 'pk': 1, 'fields': dict(dates, creator=1, status='DONE', total_amount='0')},
+    ])
+    load(path)
+    expected = (datetime.datetime(2020, 1, 1, 10, tzinfo=datetime.timezone.utc),
+                datetime.datetime(2020, 2, 3, 12, 30, tzinfo=datetime.timezone.utc))
+    assert Product.objects.values_list('created_at', 'updated_at').get() == expected
+    assert Order.objects.values_list('created_at', 'updated_at').get() == expected
+
+
+# при ошибке не остаётся частично загруженных данных
+@pytest.mark.django_db(transaction=True)
+def test_load_fixtures_rollback(tmp_path):
+    path = write_fixture(tmp_path, [
+        {'model': 'shop.product', 'pk': 1, 'fields': {'title': 'Чайник', 'price': '10.00'}},
+        {'model': 'shop.review', 'pk': 1, 'fields': {'creator': 100, 'product': 1, 'grade': 5,
+                                                     'description': 'Хорошо'}},
+    ])
+    with pytest.raises(CommandError):
+        load(path)
+    assert not Product.objects.exists()
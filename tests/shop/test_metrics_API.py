@@ -0,0 +1,64 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_204_NO_CONTENT, HTTP_403_FORBIDDEN
+
+from shop.metrics import registry
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+# каждый ответ содержит Server-Timing с числом запросов и временем в БД
+@pytest.mark.django_db
+def test_server_timing_header(client, product_factory):
+    product_factory(_quantity=2)
+    resp = client.get(reverse("products-list"))
+    assert resp.status_code == HTTP_200_OK
+    timing = resp['Server-Timing']
+    assert 'db;dur=' in timing
+    assert 'desc="1 queries"' in timing
+    assert 'serialize;dur=' in timing and 'render;dur=' in timing and 'total;dur=' in timing
+
+
+# статистика копится по ViewSet.action и доступна админу
+@pytest.mark.django_db
+def test_metrics_endpoint(client, admin_test_client, product_factory):
+    product = product_factory()
+    client.get(reverse("products-list"))
+    client.get(reverse("products-detail", args=[product.id]))
+    client.get(reverse("products-detail", args=[product.id + 1000]))
+
+    resp = admin_test_client.get(reverse("metrics-list"))
+    assert resp.status_code == HTTP_200_OK
+    stats = resp.json()
+    assert stats['ProductViewSet.list']['requests'] == 1
+    assert stats['ProductViewSet.list']['max_queries'] == 1
+    assert stats['ProductViewSet.list']['avg_bytes'] > 0
+    assert stats['ProductViewSet.list']['avg_serialize_ms'] > 0
+    assert stats['ProductViewSet.retrieve']['requests'] == 2
+    assert sum(stats['ProductViewSet.retrieve']['histogram'].values()) == 2
+
+    resp = admin_test_client.post(reverse("metrics-reset"))
+    assert resp.status_code == HTTP_204_NO_CONTENT
+    assert 'ProductViewSet.list' not in admin_test_client.get(reverse("metrics-list")).json()
+
+
+# обычный пользователь статистику не видит
+@pytest.mark.django_db
+def test_metrics_forbidden(auth_client):
+    resp = auth_client.get(reverse("metrics-list"))
+    assert resp.status_code == HTTP_403_FORBIDDEN
+
+
+# время сериализации замеряется в serializer.data без времени запросов к БД
+@pytest.mark.django_db
+def test_serialize_timing(admin_test_client, order_factory):
+    order_factory(_quantity=3, make_m2m=True)
+    resp = admin_test_client.get(reverse("orders-list"))
+    timings = dict(item.split(';dur=') for item in
+                   (part.strip().split(';desc=')[0] for part in resp['Server-Timing'].split(',')))
+    assert 0 < float(timings['serialize']) < float(timings['total'])
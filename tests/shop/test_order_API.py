@@ -1,6 +1,10 @@
 import decimal
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from shop.models import ProductsInOrder
+from shop.pricing import reprice_open_orders
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, \
     HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND
 
@@ -86,21 +90,24 @@ def test_user_cannot_get_other_users_orders(auth_client, order_factory):
 
 # тест успешного создания заказа авторизованным пользователем
 @pytest.mark.django_db
-def test_auth_user_can_create_order(user, auth_client):
+def test_auth_user_can_create_order(user, auth_client, product_factory):
     # создаём заказ
-    test_amount = decimal.Decimal(12435.00)
+    product = product_factory(price=decimal.Decimal('100.50'))
     url = reverse("orders-list")
     new_test_order = {
-        'total_amount': test_amount,
+        # сумма, переданная клиентом, игнорируется
+        'total_amount': decimal.Decimal(12435.00),
         'creator': user.id,
+        'items': [{'product': product.id, 'quantity': 3}],
     }
     # совершаем запрос POST к API по URL
-    resp = auth_client.post(url, new_test_order)
+    resp = auth_client.post(url, new_test_order, format='json')
     resp_json = resp.json()
     # проверяем код ответа,
     # если разрешения настроены правильно, код будет 201
     assert resp.status_code == HTTP_201_CREATED
-    assert decimal.Decimal(resp_json['total_amount']) == test_amount
+    # сумма посчитана по позициям заказа
+    assert decimal.Decimal(resp_json['total_amount']) == decimal.Decimal('301.50')
 
 
 # тест безуспешного создания заказа НЕ авторизованным пользователем
@@ -121,24 +128,26 @@ def test_not_auth_user_cannot_create_order(user, client, order_factory):
 
 # тест успешного изменения заказа
 @pytest.mark.django_db
-def test_user_can_update_order(user, auth_client, order_factory):
+def test_user_can_update_order(user, auth_client, order_factory, product_factory):
     # создаём заказ
     test_order = order_factory(make_m2m=True, creator=user)
+    product = product_factory(price=decimal.Decimal('1111.99'))
     # получаем id заказа
     order_id = test_order.id
     # создаём словарь с небходимыми изменениями
     updated_info = {
-        'total_amount': '1111.99'
+        'items': [{'product': product.id, 'quantity': 1}],
     }
 
     # совершаем запрос PATCH к API по URL
     order_url = reverse("orders-detail", args=[order_id])
-    resp = auth_client.patch(order_url, updated_info)
+    resp = auth_client.patch(order_url, updated_info, format='json')
     updated_order = resp.json()
     # проверяем код ответа,
     # если заказ изменён успешно, код будет 200 ОК
     assert resp.status_code == HTTP_200_OK
-    assert updated_order['total_amount'] == updated_info['total_amount']
+    assert updated_order['positions'] == [product.id]
+    assert updated_order['total_amount'] == '1111.99'
 
 
 # тест успешного удаления заказа пользователем
@@ -277,3 +286,56 @@ def test_filter_order_products(user, auth_client, order_factory):
     assert resp.status_code == HTTP_200_OK
     # проверяем, что список позиций заказа модержит нужный продукт
     assert product_id in resp_json[0]['positions']
+
+
+# список заказов загружается за постоянное число запросов
+@pytest.mark.django_db
+def test_orders_list_query_count(user, auth_client, order_factory):
+    url = reverse("orders-list")
+    order_factory(make_m2m=True, creator=user)
+    with CaptureQueriesContext(connection) as few:
+        resp = auth_client.get(url)
+    assert len(resp.json()) == 1
+
+    order_factory(_quantity=10, make_m2m=True, creator=user)
+    with CaptureQueriesContext(connection) as many:
+        resp = auth_client.get(url)
+    resp_json = resp.json()
+    assert len(resp_json) == 11
+    assert len(many) == len(few)
+
+    # в позициях есть название, цена и количество товара
+    item = resp_json[0]['items'][0]
+    assert set(item) == {'product', 'title', 'price', 'quantity'}
+    assert item['product'] in resp_json[0]['positions']
+
+
+# пересчёт сумм открытых заказов
+@pytest.mark.django_db
+def test_reprice_open_orders(order_factory, product_factory):
+    product = product_factory(price=decimal.Decimal('10.00'))
+    open_order = order_factory(status='NEW', total_amount=1)
+    done_order = order_factory(status='DONE', total_amount=1)
+    for order in (open_order, done_order):
+        ProductsInOrder.objects.create(order=order, product=product, quantity=2)
+
+    assert reprice_open_orders() == 1
+    open_order.refresh_from_db()
+    done_order.refresh_from_db()
+    assert open_order.total_amount == decimal.Decimal('20.00')
+    # закрытые заказы не трогаем
+    assert done_order.total_amount == 1
+
+
+# не-админ обновляет только переданные колонки заказа
+@pytest.mark.django_db
+def test_user_update_writes_only_changed_columns(user, auth_client, order_factory):
+    test_order = order_factory(creator=user)
+    order_url = reverse("orders-detail", args=[test_order.id])
+    with CaptureQueriesContext(connection) as queries:
+        resp = auth_client.patch(order_url, {'creator': user.id})
+    assert resp.status_code == HTTP_200_OK
+    updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "shop_order"')]
+    assert len(updates) == 1
+    assert '"status"' not in updates[0]
+    assert '"total_amount"' not in updates[0]
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+
+
+def read_stream(resp):
+    return b''.join(resp.streaming_content).decode('utf-8')
+
+
+# выгрузка всех заказов админом в NDJSON
+@pytest.mark.django_db
+def test_admin_exports_orders_ndjson(admin_test_client, order_factory, settings):
+    settings.SHOP_EXPORT_CHUNK_SIZE = 3
+    orders = order_factory(_quantity=7, make_m2m=True)
+    url = reverse("orders-export")
+    resp = admin_test_client.get(url)
+    assert resp.status_code == HTTP_200_OK
+    assert resp['Content-Type'] == 'application/x-ndjson'
+
+    rows = [json.loads(line) for line in read_stream(resp).splitlines()]
+    assert [row['id'] for row in rows] == sorted(order.id for order in orders)
+    first = orders[0]
+    assert rows[0]['items'] == [
+        {'product': line.product_id, 'quantity': line.quantity}
+        for line in first.productsinorder_set.order_by('id')
+    ]
+
+
+# выгрузка в CSV с фильтрами списка заказов
+@pytest.mark.django_db
+def test_user_exports_own_orders_csv_with_filter(user, auth_client, order_factory):
+    order_factory(_quantity=2, creator=user, status='DONE')
+    order_factory(creator=user, status='NEW')
+    # чужие заказы не выгружаются
+    order_factory(status='DONE')
+    url = reverse("orders-export")
+    resp = auth_client.get(url, {'output': 'csv', 'status': 'DONE'})
+    assert resp.status_code == HTTP_200_OK
+    rows = list(csv.DictReader(io.StringIO(read_stream(resp))))
+    assert len(rows) == 2
+    assert {row['status'] for row in rows} == {'DONE'}
+    assert {row['creator'] for row in rows} == {str(user.id)}
+
+
+# неизвестный формат выгрузки
+@pytest.mark.django_db
+def test_export_unknown_format(auth_client):
+    resp = auth_client.get(reverse("orders-export"), {'output': 'xml'})
+    assert resp.status_code == HTTP_400_BAD_REQUEST
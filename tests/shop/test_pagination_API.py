@@ -0,0 +1,81 @@
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+
+
+# без параметров пагинации список отдаётся целиком, как раньше
+@pytest.mark.django_db
+def test_products_list_without_pagination(client, product_factory):
+    product_factory(_quantity=5)
+    url = reverse("products-list")
+    resp = client.get(url)
+    assert resp.status_code == HTTP_200_OK
+    assert isinstance(resp.json(), list)
+    assert len(resp.json()) == 5
+
+
+# проход по всем страницам через cursor
+@pytest.mark.django_db
+def test_products_keyset_pagination(client, product_factory):
+    products = product_factory(_quantity=7)
+    url = reverse("products-list")
+    resp = client.get(url, {'page_size': 3})
+    assert resp.status_code == HTTP_200_OK
+
+    received = []
+    pages = 0
+    while True:
+        resp_json = resp.json()
+        received += [product['id'] for product in resp_json['results']]
+        pages += 1
+        if not resp_json['next']:
+            break
+        resp = client.get(resp_json['next'])
+        assert resp.status_code == HTTP_200_OK
+
+    # каждая запись встречается ровно один раз
+    assert pages == 3
+    assert received == sorted(product.id for product in products)
+
+
+# размер страницы ограничен сверху
+@pytest.mark.django_db
+def test_page_size_cap(client, product_factory, settings):
+    settings.SHOP_MAX_PAGE_SIZE = 2
+    product_factory(_quantity=5)
+    url = reverse("products-list")
+    resp = client.get(url, {'page_size': 100})
+    assert len(resp.json()['results']) == 2
+
+
+# пользователи пагинируются по дате регистрации
+@pytest.mark.django_db
+def test_users_keyset_pagination(client, user, admin_user):
+    url = reverse("all-profiles-list")
+    resp = client.get(url, {'page_size': 1})
+    resp_json = resp.json()
+    assert len(resp_json['results']) == 1
+    resp = client.get(resp_json['next'])
+    assert len(resp.json()['results']) == 1
+
+
+# некорректный курсор
+@pytest.mark.django_db
+def test_invalid_cursor(client):
+    url = reverse("product-reviews-list")
+    resp = client.get(url, {'cursor': 'not-a-cursor'})
+    assert resp.status_code == HTTP_404_NOT_FOUND
+
+
+# курсор нельзя совмещать с другой сортировкой: ?ordering= и поиск ?q= не отбрасываются молча
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{'ordering': '-price'}, {'q': 'чайник'}])
+def test_pagination_with_ordering(client, product_factory, params):
+    product_factory(_quantity=3, title='чайник')
+    url = reverse("products-list")
+    resp = client.get(url, dict(params, page_size=2))
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert 'ordering' in resp.json()
+    # с фильтрами, не меняющими порядок, пагинация работает
+    resp = client.get(url, {'page_size': 2, 'price_min': 0})
+    assert resp.status_code == HTTP_200_OK
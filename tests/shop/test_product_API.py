@@ -210,3 +210,38 @@ def test_filter_product_description(auth_client, product_factory):
     resp2_json = resp2.json()
     assert resp2.status_code == HTTP_200_OK
     assert part_of_description in resp2_json[0]['description']
+
+
+# полнотекстовый поиск по названию и описанию
+@pytest.mark.django_db
+def test_products_full_text_search(client, product_factory):
+    product_factory(title='red apple', description='sweet fruit from the garden')
+    product_factory(title='green apple', description='sour')
+    product_factory(title='banana', description='yellow fruit')
+    url = reverse("products-list")
+
+    resp = client.get(url, {'q': 'apple'})
+    assert resp.status_code == HTTP_200_OK
+    assert {product['title'] for product in resp.json()} == {'red apple', 'green apple'}
+
+    # все слова запроса должны встретиться в названии или описании
+    resp = client.get(url, {'q': 'fruit apple'})
+    assert [product['title'] for product in resp.json()] == ['red apple']
+
+    # спецсимволы в запросе не ломают поиск
+    resp = client.get(url, {'q': '"banana" OR -'})
+    assert resp.status_code == HTTP_200_OK
+
+
+# поисковый индекс обновляется вместе с товаром
+@pytest.mark.django_db
+def test_products_search_index_follows_updates(client, product_factory, django_capture_on_commit_callbacks):
+    product = product_factory(title='old title')
+    product.title = 'brand new'
+    product.save()
+    url = reverse("products-list")
+    assert client.get(url, {'q': 'old'}).json() == []
+    assert client.get(url, {'q': 'brand'}).json()[0]['id'] == product.id
+    with django_capture_on_commit_callbacks(execute=True):
+        product.delete()
+    assert client.get(url, {'q': 'brand'}).json() == []
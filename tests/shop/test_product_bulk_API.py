@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+from shop.models import Product
+
+
+# массовое создание и обновление товаров JSON-массивом
+@pytest.mark.django_db
+def test_admin_bulk_create_and_update(admin_test_client, product_factory):
+    product = product_factory(title='old', price=10)
+    url = reverse("products-bulk")
+    rows = [
+        {'title': 'first', 'price': '1.50'},
+        {'id': product.id, 'price': '99.99'},
+        {'title': 'no price'},
+        {'id': 100500, 'price': '1.00'},
+        {'title': 'second', 'price': '2.00', 'description': 'text'},
+    ]
+    resp = admin_test_client.post(url, rows, format='json')
+    resp_json = resp.json()
+    assert resp.status_code == HTTP_200_OK
+    assert resp_json['rows'] == 5
+    assert resp_json['created'] == 2
+    assert resp_json['updated'] == 1
+    # ошибки возвращаются по каждой строке
+    assert [error['index'] for error in resp_json['errors']] == [2, 3]
+    assert 'price' in resp_json['errors'][0]['errors']
+    assert 'rows_per_second' in resp_json
+
+    product.refresh_from_db()
+    assert product.title == 'old'
+    assert str(product.price) == '99.99'
+    assert Product.objects.filter(title__in=['first', 'second']).count() == 2
+
+
+# массовая загрузка NDJSON-потоком
+@pytest.mark.django_db
+def test_admin_bulk_ndjson(admin_test_client, settings):
+    settings.SHOP_BULK_CHUNK_SIZE = 2
+    url = reverse("products-bulk")
+    body = '\n'.join(json.dumps({'title': 'p%d' % i, 'price': i}) for i in range(5))
+    resp = admin_test_client.post(url, body, content_type='application/x-ndjson')
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['created'] == 5
+    assert Product.objects.count() == 5
+
+
+# битый NDJSON: уже записанные пачки откатываются
+@pytest.mark.django_db
+def test_admin_bulk_invalid_ndjson(admin_test_client, settings):
+    settings.SHOP_BULK_CHUNK_SIZE = 1
+    url = reverse("products-bulk")
+    body = '{"title": "ok", "price": 1}\n{"title": "ok", "price": 2}\n{oops'
+    resp = admin_test_client.post(url, body, content_type='application/x-ndjson')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert not Product.objects.exists()
+
+
+# тело запроса - не массив
+@pytest.mark.django_db
+@pytest.mark.parametrize('body', ['5', '"text"', '{"title": "x"}', 'null'])
+def test_admin_bulk_not_a_list(admin_test_client, body):
+    url = reverse("products-bulk")
+    resp = admin_test_client.post(url, body, content_type='application/json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+
+
+# массовая загрузка доступна только админам
+@pytest.mark.django_db
+def test_user_cannot_bulk_create(auth_client):
+    url = reverse("products-bulk")
+    resp = auth_client.post(url, [{'title': 'x', 'price': 1}], format='json')
+    assert resp.status_code == HTTP_403_FORBIDDEN
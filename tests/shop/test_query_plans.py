@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+from django.db import connection
+from shop.models import Order, Product, Review
+
+SINCE = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def query_plan(queryset):
+    # на маленьких таблицах PostgreSQL предпочитает seq scan,
+    # поэтому проверяем, что подходящий индекс вообще может быть использован
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+
+# список заказов пользователя
+@pytest.mark.django_db
+def test_order_list_uses_creator_created_index(user):
+    queryset = Order.objects.filter(creator=user).order_by('created_at')
+    assert 'order_creator_created_idx' in query_plan(queryset)
+
+
+# фильтрация заказов по статусу
+@pytest.mark.django_db
+def test_order_status_filter_uses_index():
+    queryset = Order.objects.filter(status=Order.OrderStatus.NEW).order_by('created_at')
+    assert 'order_status_created_idx' in query_plan(queryset)
+
+
+# фильтрация заказов по сумме и датам
+@pytest.mark.django_db
+@pytest.mark.parametrize('lookup, index', [
+    ({'total_amount__gte': 100}, 'order_total_amount_idx'),
+    ({'updated_at__gte': SINCE}, 'order_updated_idx'),
+    ({'created_at__gte': SINCE}, 'order_created_idx'),
+])
+def test_order_range_filters_use_index(lookup, index):
+    assert index in query_plan(Order.objects.filter(**lookup))
+
+
+# фильтрация товаров по цене
+@pytest.mark.django_db
+def test_product_price_filter_uses_index():
+    queryset = Product.objects.filter(price__gte=10, price__lte=100)
+    assert 'product_price_idx' in query_plan(queryset)
+
+
+# фильтрация отзывов по товару и автору, по дате создания
+@pytest.mark.django_db
+def test_review_filters_use_indexes(user, product_factory):
+    product = product_factory()
+    queryset = Review.objects.filter(product=product)
+    assert 'shop_review_product_id' in query_plan(queryset)
+    queryset = Review.objects.filter(created_at__gte=SINCE)
+    assert 'review_created_idx' in query_plan(queryset)
@@ -0,0 +1,118 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT
+from shop.models import Review
+
+
+# агрегаты обновляются при создании, изменении и удалении отзыва
+@pytest.mark.django_db
+def test_review_aggregates_follow_reviews(user, auth_client, product_factory):
+    product = product_factory()
+    url = reverse("product-reviews-list")
+    resp = auth_client.post(url, {'product': product.id, 'grade': 4, 'description': 'ok'})
+    assert resp.status_code == HTTP_201_CREATED
+    review_id = resp.json()['id']
+
+    product.refresh_from_db()
+    assert product.review_count == 1
+    assert product.avg_grade == 4
+    assert product.grade_histogram == {1: 0, 2: 0, 3: 0, 4: 1, 5: 0}
+
+    review_url = reverse("product-reviews-detail", args=[review_id])
+    resp = auth_client.patch(review_url, {'grade': 2, 'product': product.id})
+    assert resp.status_code == HTTP_200_OK
+    product.refresh_from_db()
+    assert product.review_count == 1
+    assert product.avg_grade == 2
+    assert product.grade_4_count == 0
+    assert product.grade_2_count == 1
+
+    resp = auth_client.delete(review_url)
+    assert resp.status_code == HTTP_204_NO_CONTENT
+    product.refresh_from_db()
+    assert product.review_count == 0
+    assert product.avg_grade is None
+
+
+# агрегаты видны в API товаров и по ним можно сортировать
+@pytest.mark.django_db
+def test_products_ordering_by_avg_grade(client, product_factory):
+    product_factory(title='low', avg_grade=2.5, review_count=2)
+    product_factory(title='high', avg_grade=4.5, review_count=2)
+    url = reverse("products-list")
+    resp = client.get(url, {'ordering': '-avg_grade'})
+    resp_json = resp.json()
+    assert resp.status_code == HTTP_200_OK
+    assert [product['title'] for product in resp_json] == ['high', 'low']
+    assert resp_json[0]['grade_histogram'] == {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0}
+
+
+# команда пересчёта агрегатов
+@pytest.mark.django_db
+def test_rebuild_ratings_command(product_factory, review_factory):
+    product, empty_product = product_factory(_quantity=2, review_count=10, avg_grade=1)
+    review_factory(product=product, grade=5)
+    review_factory(product=product, grade=3)
+
+    call_command('rebuild_ratings', batch_size=1)
+
+    product.refresh_from_db()
+    empty_product.refresh_from_db()
+    assert product.review_count == 2
+    assert product.avg_grade == 4
+    assert product.grade_histogram[5] == 1
+    assert empty_product.review_count == 0
+    assert empty_product.avg_grade is None
+
+
+# агрегаты обновляются при удалении отзыва в обход API: из админки и каскадом с пользователем
+@pytest.mark.django_db
+def test_review_aggregates_follow_delete(product_factory, review_factory, django_user_model):
+    product = product_factory()
+    author, other = django_user_model.objects.create(username='a'), django_user_model.objects.create(username='b')
+    review_factory(product=product, creator=author, grade=5)
+    kept = review_factory(product=product, creator=other, grade=3)
+    review = review_factory(product=product_factory(), creator=other, grade=1)
+
+    author.delete()
+    product.refresh_from_db()
+    assert product.review_count == 1
+    assert product.avg_grade == 3
+    assert product.grade_5_count == 0
+
+    kept.delete()
+    product.refresh_from_db()
+    assert product.review_count == 0
+    assert product.avg_grade is None
+
+    # удаление товара удаляет его отзывы каскадом без ошибок
+    review.product.delete()
+
+
+# отзыв, созданный и изменённый через ORM, учитывается так же, как из API, и удаление его вычитает
+@pytest.mark.django_db
+def test_review_aggregates_follow_orm(user, product_factory):
+    product, other_product = product_factory(_quantity=2)
+    review = Review.objects.create(product=product, creator=user, grade=4, description='ok')
+    product.refresh_from_db()
+    assert product.review_count == 1
+    assert product.grade_4_count == 1
+
+    review.description = 'не влияет на агрегаты'
+    review.save(update_fields=['description'])
+    review.grade = 2
+    review.product = other_product
+    review.save()
+    product.refresh_from_db()
+    other_product.refresh_from_db()
+    assert product.review_count == 0
+    assert product.avg_grade is None
+    assert other_product.review_count == 1
+    assert other_product.avg_grade == 2
+
+    review.delete()
+    other_product.refresh_from_db()
+    assert other_product.review_count == 0
+    assert other_product.grade_2_count == 0
+    assert other_product.avg_grade is None
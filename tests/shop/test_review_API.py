@@ -1,5 +1,10 @@
+from types import SimpleNamespace
+
 import pytest
+from django.db import IntegrityError
 from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from shop.serializers import ReviewSerializer
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, \
     HTTP_401_UNAUTHORIZED, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
 
@@ -219,3 +224,31 @@ def test_filter_review_product_id(auth_client, review_factory):
     # совершаем запрос GET к API по URL
     resp = auth_client.get(url, {'product': product_id})
     assert resp.status_code == HTTP_200_OK
+
+
+# повторный отзыв, прошедший проверку в validate (гонка), отклоняется ограничением БД
+@pytest.mark.django_db
+def test_duplicate_review_race_is_validation_error(user, review_factory):
+    existing = review_factory(creator=user)
+    serializer = ReviewSerializer(context={'request': SimpleNamespace(user=user, method='POST')})
+    with pytest.raises(ValidationError) as error:
+        serializer.create({'product': existing.product, 'grade': 5, 'description': 'again'})
+    assert 'You already posted review for this product' in str(error.value.detail)
+
+
+# прочие нарушения ограничений БД не выдаются за повторный отзыв
+@pytest.mark.django_db
+def test_review_integrity_error_is_not_duplicate(user, product_factory):
+    serializer = ReviewSerializer(context={'request': SimpleNamespace(user=user, method='POST')})
+    with pytest.raises(IntegrityError):
+        serializer.create({'product': product_factory(), 'grade': 5, 'description': None})
+
+
+# частичное обновление отзыва без товара не проверяет дубликаты
+@pytest.mark.django_db
+def test_user_can_patch_review_without_product(user, auth_client, review_factory):
+    test_review = review_factory(creator=user)
+    review_url = reverse("product-reviews-detail", args=[test_review.id])
+    resp = auth_client.patch(review_url, {'grade': 1})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['grade'] == 1
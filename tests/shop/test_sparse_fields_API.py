@@ -0,0 +1,67 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+
+
+# ?fields= оставляет только перечисленные поля и сужает SELECT
+@pytest.mark.django_db
+def test_products_sparse_fields(client, product_factory):
+    product_factory(_quantity=3)
+    url = reverse("products-list")
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get(url, {'fields': 'id,title,price'})
+    assert resp.status_code == HTTP_200_OK
+    assert set(resp.json()[0]) == {'id', 'title', 'price'}
+    select = [query['sql'] for query in queries if 'FROM "shop_product"' in query['sql']][0]
+    assert '"description"' not in select
+    assert '"price"' in select
+
+
+# во вложенном авторе отзыва нет пароля, групп и прав
+@pytest.mark.django_db
+def test_review_creator_is_public(client, review_factory):
+    review_factory()
+    creator = client.get(reverse("product-reviews-list")).json()[0]['creator']
+    assert set(creator) == {'id', 'username', 'first_name', 'last_name'}
+
+
+# отзывы с авторами загружаются за постоянное число запросов
+@pytest.mark.django_db
+def test_reviews_list_query_count(client, review_factory):
+    url = reverse("product-reviews-list")
+    review_factory()
+    with CaptureQueriesContext(connection) as few:
+        client.get(url, {'expand': 'product'})
+    review_factory(_quantity=10)
+    with CaptureQueriesContext(connection) as many:
+        resp = client.get(url, {'expand': 'product'})
+    assert len(many) == len(few)
+    assert set(resp.json()[0]['product']) == {'id', 'title', 'price'}
+
+
+# без автора в fields вложенный сериализатор и JOIN не нужны
+@pytest.mark.django_db
+def test_reviews_without_creator(client, review_factory):
+    review_factory()
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get(reverse("product-reviews-list"), {'fields': 'id,grade'})
+    assert set(resp.json()[0]) == {'id', 'grade'}
+    assert len(queries) == 1
+    assert 'auth_user' not in queries[0]['sql']
+
+
+# ?expand=creator у заказов и игнорирование fields при записи
+@pytest.mark.django_db
+def test_orders_expand_creator(user, auth_client, order_factory):
+    order_factory(creator=user)
+    url = reverse("orders-list")
+    resp = auth_client.get(url, {'expand': 'creator', 'fields': 'id,creator'})
+    assert resp.json()[0] == {'id': resp.json()[0]['id'], 'creator': {
+        'id': user.id, 'username': user.username, 'first_name': '', 'last_name': '',
+    }}
+
+    resp = auth_client.post(url + '?fields=id', {'creator': user.id})
+    assert resp.status_code == HTTP_201_CREATED
+    assert 'status' in resp.json()